@@ -0,0 +1,75 @@
+import heapq
+import logging
+from app.config import get_assignment_count_weight
+
+
+def solve_assignments(task_ids, tasks, assignment_count_per_person, total_priority_by_user, count_weight=None):
+    """
+    Deterministic load-balancing assignment of tasks, using the same inputs as the GPT prompt.
+
+    Each user's load is their total priority score plus count_weight per assigned task. Tasks are
+    handed out most urgent first, each to the least loaded user (greedy min-heap), whose load then
+    grows by the task's priority score. Like the GPT prompt, every task gets three recommendations:
+    the two least loaded users and the user carrying the most tasks.
+
+    Args:
+        task_ids (list): Ids of the tasks to assign.
+        tasks (list): Tasks with 'id' and 'priority_score', as built by build_assignment_context.
+        assignment_count_per_person (dict): Email -> {"displayName", "taskCount"}.
+        total_priority_by_user (dict): Email -> total priority score of the user's tasks.
+        count_weight (float): Load added per task; defaults to ASSIGNMENT_COUNT_WEIGHT.
+
+    Returns:
+        dict: Task id -> list of {"email", "display_name", "reason"}, best candidate first.
+    """
+    if count_weight is None:
+        count_weight = get_assignment_count_weight()
+
+    display_names = {}
+    task_counts = {}
+    for email, details in assignment_count_per_person.items():
+        details = details if isinstance(details, dict) else {}
+        display_names[email] = details.get("displayName", email)
+        task_counts[email] = details.get("taskCount", 0)
+
+    if not task_counts:
+        logging.warning('No users available for local task assignment.')
+        return {task_id: [] for task_id in task_ids}
+
+    priority_totals = {email: total_priority_by_user.get(email, 0) for email in task_counts}
+    heap = [(priority_totals[email] + count_weight * task_counts[email], email) for email in task_counts]
+    heapq.heapify(heap)
+
+    scores = {str(task.get("id")): task.get("priority_score", 0) for task in tasks}
+    # Most urgent tasks first so they land on the least loaded people; ties keep the request order
+    ordered = sorted(enumerate(task_ids), key=lambda pair: (-scores.get(str(pair[1]), 0), pair[0]))
+
+    def recommendation(email, reason):
+        return {
+            "email": email,
+            "display_name": display_names[email],
+            "reason": f"{reason} Currently has {task_counts[email]} tasks with a total priority score of {priority_totals[email]}.",
+        }
+
+    results = {}
+    for _, task_id in ordered:
+        score = scores.get(str(task_id), 0)
+        load, primary = heapq.heappop(heap)
+        recommendations = [recommendation(primary, f"Least loaded user for a task with priority score {score}.")]
+        if heap:
+            recommendations.append(recommendation(heap[0][1], "Next least loaded user, keeping the workload balanced."))
+
+        picked = {recommendation["email"] for recommendation in recommendations}
+        others = [email for email in task_counts if email not in picked]
+        if others:
+            senior = max(others, key=lambda email: (task_counts[email], email))
+            recommendations.append(recommendation(
+                senior, "Balances the most tasks, showing capability to handle critical tasks."))
+        results[task_id] = recommendations
+
+        # Give the task to the primary recommendation and put them back with the extra load
+        task_counts[primary] += 1
+        priority_totals[primary] += score
+        heapq.heappush(heap, (load + score + count_weight, primary))
+
+    return results
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import threading
+import httpx
+import requests
+from app.config import (
+    get_pat,
+    get_azure_devops_pool_size,
+    get_azure_devops_max_retries,
+    get_azure_devops_backoff_factor,
+    get_azure_devops_timeout,
+    get_work_item_batch_concurrency,
+)
+from app.devops_client import RETRY_STATUS_CODES, work_item_batch_url, split_work_item_pages, work_item_batch_payload
+
+_loop = None
+_loop_thread = None
+_loop_lock = threading.Lock()
+_client = None  # httpx.AsyncClient, only ever used on the service loop
+
+
+def get_loop():
+    """Return the process-wide service event loop, starting its thread on first use."""
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name='async-service', daemon=True)
+            _loop_thread.start()
+        return _loop
+
+
+def run_async(coro, timeout=None):
+    """
+    Run a coroutine on the service event loop and wait for its result.
+
+    This is the bridge used by the synchronous Flask routes: the I/O fanned out by the
+    coroutine runs as concurrent tasks on one loop and one connection pool shared by
+    every request, instead of a thread per outstanding call.
+
+    Args:
+        coro (coroutine): The coroutine to run.
+        timeout (float): Seconds to wait before giving up; waits indefinitely by default.
+
+    Returns:
+        The coroutine's result.
+
+    Raises:
+        RuntimeError: If called from the service loop itself, which would deadlock.
+    """
+    loop = get_loop()
+    if threading.current_thread() is _loop_thread:
+        coro.close()
+        raise RuntimeError('run_async cannot be called from the service event loop; await the coroutine instead.')
+    return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+
+def _get_client():
+    """Return the shared httpx.AsyncClient, creating it on the service loop on first use."""
+    global _client
+    if _client is None:
+        pool_size = get_azure_devops_pool_size()
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+    return _client
+
+
+def _retry_delay(response, attempt):
+    """Seconds to wait before the next attempt, honoring Retry-After like the synchronous session."""
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after:
+        try:
+            return max(float(retry_after), 0)
+        except ValueError:
+            pass
+    return get_azure_devops_backoff_factor() * (2 ** attempt)
+
+
+async def devops_request_async(method, url, **kwargs):
+    """
+    Send a request to Azure DevOps through the shared async client.
+
+    Behaves like devops_request: the PAT is sent as basic auth, the configured timeout
+    applies, and throttling, server errors and connection failures are retried with
+    exponential backoff.
+
+    Raises:
+        requests.exceptions.RequestException: If the request could not be sent, so callers
+        handle failures the same way as with the synchronous client.
+    """
+    kwargs.setdefault('auth', httpx.BasicAuth('', get_pat() or ''))  # Empty username, PAT as the password
+    kwargs.setdefault('timeout', get_azure_devops_timeout())
+    client = _get_client()
+    retries = max(get_azure_devops_max_retries(), 0)
+
+    for attempt in range(retries + 1):
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            if attempt == retries:
+                raise requests.exceptions.ConnectionError(str(e)) from e
+            logging.debug(f'{method} {url} failed ({e}); retrying')
+            await asyncio.sleep(_retry_delay(None, attempt))
+            continue
+        if response.status_code not in RETRY_STATUS_CODES or attempt == retries:
+            return response
+        logging.debug(f'{method} {url} returned {response.status_code}; retrying')
+        await asyncio.sleep(_retry_delay(response, attempt))
+
+
+async def devops_get_async(url, **kwargs):
+    return await devops_request_async('GET', url, **kwargs)
+
+
+async def devops_post_async(url, **kwargs):
+    return await devops_request_async('POST', url, **kwargs)
+
+
+async def devops_patch_async(url, **kwargs):
+    return await devops_request_async('PATCH', url, **kwargs)
+
+
+async def fetch_work_items_batch_async(work_item_ids, base_url=None, max_concurrency=None, fields=None, as_of=None):
+    """
+    Fetch full details for a list of work item ids as concurrent tasks on the service loop.
+
+    Same contract as fetch_work_items_batch: pages of 200 ids, at most WORK_ITEM_BATCH_CONCURRENCY
+    in flight, results in the original id order.
+
+    Args:
+        work_item_ids (list): Work item ids, e.g. from a WIQL query.
+        base_url (str): REST API base URL of the project; defaults to the current project.
+        max_concurrency (int): Concurrency limit overriding the configured one.
+        fields (list): Reference names of the fields to return; defaults to all fields.
+        as_of (str): ISO 8601 UTC timestamp to read the work items as of; defaults to now.
+
+    Returns:
+        list or None: Raw work items, or None if any page failed.
+
+    Raises:
+        requests.exceptions.RequestException: If a page request could not be sent.
+    """
+    if not work_item_ids:
+        return []
+
+    details_url = work_item_batch_url(base_url)
+    semaphore = asyncio.Semaphore(max(1, max_concurrency or get_work_item_batch_concurrency()))
+
+    async def fetch_page(batch_ids):
+        async with semaphore:
+            response = await devops_post_async(details_url, json=work_item_batch_payload(batch_ids, fields, as_of))
+        if response.status_code != 200:
+            logging.error(f'Failed to fetch work item details: {response.status_code}')
+            logging.error(f'Response Content: {response.content.decode()}')
+            return None
+        return response.json().get('value', [])
+
+    pages = await asyncio.gather(*(fetch_page(page) for page in split_work_item_pages(work_item_ids)))
+    if any(page is None for page in pages):
+        return None
+    return [item for page in pages for item in page]
+
+
+async def gather_bounded(coros, limit):
+    """
+    Await coroutines concurrently with at most limit of them running at once.
+
+    Returns:
+        list: Results in the order of coros; the first exception is raised.
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def bounded(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(bounded(coro) for coro in coros))
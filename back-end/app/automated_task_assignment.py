@@ -1,68 +1,72 @@
+import asyncio
 import logging
 import requests
-from requests.auth import HTTPBasicAuth
-from helper.chatgpt import send_chat
-from app.config import PAT, get_azure_devops_rest_api_url, get_azure_devops_graph_api_url, get_project_name, get_org_name
+from helper.chatgpt import send_chat, send_chat_async, count_tokens
+from app.config import get_azure_devops_rest_api_url, get_project_name, get_org_name, get_gpt_assignment_token_budget, get_openai_concurrency, get_bulk_update_concurrency, get_bulk_update_max_attempts
+from app.async_service import run_async, gather_bounded, devops_get_async, devops_patch_async
+from app.single_flight import single_flight
+from app.work_item_cache import work_item_cache
+from app.user_directory import user_directory
+from app.devops_client import fetch_work_items_batch, devops_post, devops_patch
+from app.stats import summarize_work_items
+from app.assignment_solver import solve_assignments
 import json
+import numpy as np
+import pandas as pd
 from datetime import datetime, timezone, timedelta
 def get_all_users():
     """
-    Fetch and clean all users from Azure DevOps Graph API.
+    Return all users of the organization from the user directory.
+    The list is paged through the Graph API, cached per organization and
+    shared by concurrent callers.
     """
-    url = f'{get_azure_devops_graph_api_url()}/users?api-version=7.1-preview.1'
-    auth = HTTPBasicAuth('', PAT)  # Empty username, PAT as the password
-    try:
-        response = requests.get(url, auth=auth)
-        print(response)
-        logging.debug(f'Response Status Code: {response.status_code}')
-        if response.status_code == 200:
-            raw_data = response.json()
-            cleaned_data = clean_user_data(raw_data)
-            return {"count": len(cleaned_data), "users": cleaned_data}
-        else:
-            logging.error(f'Failed to fetch data from Azure DevOps: {response.status_code}')
-            logging.error(f'Response Content: {response.content.decode()}')
-            return None
-    except requests.exceptions.RequestException as e:
-        logging.error(f'Request failed: {e}')
-        return None
+    index = user_directory.get()
+    return index.as_response() if index else None
 
-def clean_user_data(raw_data):
+async def get_all_users_async():
     """
-    Clean and structure user data from the raw API response.
+    Async version of get_all_users, for use on the async service loop.
+    Shares the cache and in-flight requests with get_all_users.
     """
-    users = raw_data.get("value", [])
-    cleaned_users = []
-
-    for user in users:
-        cleaned_users.append({
-            "displayName": user.get("displayName", "N/A"),
-            "domain": user.get("domain", "N/A"),
-            "mailAddress": user.get("mailAddress", "N/A"),
-            "principalName": user.get("principalName", "N/A"),
-        })
-    return cleaned_users
+    index = await user_directory.get_async()
+    return index.as_response() if index else None
+
+# Fields shown for unassigned tasks on the tasks page; id and url are always returned
+UNASSIGNED_TASK_FIELDS = [
+    'System.Id',
+    'System.Title',
+    'System.State',
+    'System.WorkItemType',
+    'System.TeamProject',
+]
 
 def fetch_unassigned_tasks():
     """
     Fetch unassigned tasks from Azure DevOps using WIQL.
+    Concurrent calls for the same project share one fetch.
     """
-    url = f'https://dev.azure.com/{get_org_name()}/{get_project_name()}/_apis/wit/wiql?api-version=7.1-preview.2'
-    auth = HTTPBasicAuth('', PAT)  # Empty username, PAT as the password
+    org, project = get_org_name(), get_project_name()
+    return single_flight.do(
+        ('unassigned_tasks', org, project, tuple(UNASSIGNED_TASK_FIELDS)),
+        lambda: _fetch_unassigned_tasks(org, project),
+    )
+
+def _fetch_unassigned_tasks(org, project):
+    url = f'https://dev.azure.com/{org}/{project}/_apis/wit/wiql?api-version=7.1-preview.2'
 
     # Define the WIQL query
     query = {
         "query": f"""
         SELECT [System.Id], [System.Title], [System.State], [System.AssignedTo], [System.TeamProject]
         FROM WorkItems
-        WHERE [System.AssignedTo] = '' AND [System.TeamProject] = '{get_project_name()}'
+        WHERE [System.AssignedTo] = '' AND [System.TeamProject] = '{project}'
         ORDER BY [System.ChangedDate] DESC
         """
     }
 
     try:
         # Send POST request to execute the WIQL query
-        response = requests.post(url, auth=auth, json=query)
+        response = devops_post(url, json=query)
         logging.debug(f'WIQL Query URL: {url}')
         logging.debug(f'WIQL Query Payload: {query}')
         logging.debug(f'Response Status Code: {response.status_code}')
@@ -74,24 +78,11 @@ def fetch_unassigned_tasks():
             work_item_ids = [item['id'] for item in work_item_refs]
             logging.debug(f'Fetched Work Item IDs: {work_item_ids}')
             
-            # Fetch full details for each work item in batches of 200
-            all_work_items = []
-            for i in range(0, len(work_item_ids), 200):
-                batch_ids = work_item_ids[i:i+200]
-                details_url = f"https://dev.azure.com/{get_org_name()}/{get_project_name()}/_apis/wit/workitemsbatch?api-version=7.1-preview.1"
-                details_payload = {"ids": batch_ids}
-                details_response = requests.post(details_url, auth=auth, json=details_payload)
-                logging.debug(f'Details URL: {details_url}')
-                logging.debug(f'Details Payload: {details_payload}')
-                logging.debug(f'Details Response Status Code: {details_response.status_code}')
-                logging.debug(f'Details Response Content: {details_response.content.decode()}')
-                
-                if details_response.status_code == 200:
-                    all_work_items.extend(details_response.json().get('value', []))
-                else:
-                    logging.error(f'Failed to fetch work item details: {details_response.status_code}')
-                    logging.error(f'Response Content: {details_response.content.decode()}')
-                    return None
+            # Fetch only the displayed fields, 200 ids per concurrent batch request
+            all_work_items = fetch_work_items_batch(
+                work_item_ids, base_url=f'https://dev.azure.com/{org}/{project}/_apis', fields=UNASSIGNED_TASK_FIELDS)
+            if all_work_items is None:
+                return None
             
             return {"workItems": all_work_items}
         else:
@@ -102,42 +93,6 @@ def fetch_unassigned_tasks():
         logging.error(f'Request failed: {e}')
         return None
 
-def get_work_item_count_for_user(user_email):
-    """
-    Get the count of work items assigned to a specific user from Azure DevOps.
-    """
-    prj = get_project_name()
-    url = f'https://dev.azure.com/{get_org_name()}/{get_project_name()}/_apis/wit/wiql?api-version=7.1-preview.2'
-    auth = HTTPBasicAuth('', PAT)  # Empty username, PAT as the password
-
-    # Define the WIQL query
-    query = {
-        "query": f"""
-        SELECT [System.Id]
-        FROM WorkItems
-        WHERE [System.AssignedTo] = '{user_email}'  AND [System.TeamProject] = '{prj}'
-        """
-    }
-
-    try:
-        # Execute the WIQL query
-        response = requests.post(url, auth=auth, json=query)
-        logging.debug(f'WIQL Query URL: {url}')
-        logging.debug(f'WIQL Query Payload: {query}')
-        logging.debug(f'Response Status Code: {response.status_code}')
-        logging.debug(f'Response Content: {response.content.decode()}')
-        
-        if response.status_code == 200:
-            work_items = response.json().get('workItems', [])
-            return len(work_items)
-        else:
-            logging.error(f'Failed to fetch work item count for {user_email}: {response.status_code}')
-            logging.error(f'Response Content: {response.content.decode()}')
-            return 0
-    except requests.exceptions.RequestException as e:
-        logging.error(f'Request failed for {user_email}: {e}')
-        return 0
-
 def get_work_item_counts_for_all_users():
     """
     Get the work item count for all users retrieved from Azure DevOps.
@@ -148,17 +103,26 @@ def get_work_item_counts_for_all_users():
         logging.error('Failed to fetch users data.')
         return None
 
+    # One project-wide fetch grouped by System.AssignedTo instead of a WIQL query per user
+    summary = summarize_work_items(["assignee"])
+    if summary is None:
+        logging.error('Failed to fetch work item counts by assignee.')
+        return None
+
+    counts_by_email = {}
+    for assignee, count in summary["assignee"].items():
+        counts_by_email[assignee.lower()] = counts_by_email.get(assignee.lower(), 0) + count
+
     users = users_data["users"]
     user_task_counts = {}
 
-    # Loop through each user and fetch their work item count
     for user in users:
         user_email = user.get("mailAddress")
         if not user_email:
             logging.debug(f'Skipping user {user["displayName"]} (no email address).')
             continue
 
-        task_count = get_work_item_count_for_user(user_email)
+        task_count = counts_by_email.get(user_email.lower(), 0)
         user_task_counts[user_email] = {
             "displayName": user["displayName"],
             "taskCount": task_count
@@ -171,7 +135,6 @@ def update_work_item_assigned_to(work_item_id, user_email):
     Update the 'Assigned To' field of a work item in Azure DevOps.
     """
     url = f'https://dev.azure.com/{get_org_name()}/{get_project_name()}/_apis/wit/workitems/{work_item_id}?api-version=7.1-preview.3'
-    auth = HTTPBasicAuth('', PAT)  # Empty username, PAT as the password
     headers = {'Content-Type': 'application/json-patch+json'}
     payload = [
         {
@@ -182,7 +145,7 @@ def update_work_item_assigned_to(work_item_id, user_email):
     ]
     try:
         logging.debug(f'Attempting to update work item {work_item_id} with user {user_email}')
-        response = requests.patch(url, auth=auth, headers=headers, json=payload)
+        response = devops_patch(url, headers=headers, json=payload)
         logging.debug(f'Update Work Item URL: {url}')
         logging.debug(f'Update Work Item Headers: {headers}')
         logging.debug(f'Update Work Item Payload: {payload}')
@@ -191,6 +154,7 @@ def update_work_item_assigned_to(work_item_id, user_email):
 
         if response.status_code == 200:
             logging.info(f'Successfully updated work item {work_item_id} to {user_email}')
+            work_item_cache.invalidate(get_org_name(), get_project_name())
             return response.json()
         else:
             logging.error(f'Failed to update work item {work_item_id}: {response.status_code}')
@@ -199,7 +163,112 @@ def update_work_item_assigned_to(work_item_id, user_email):
     except requests.exceptions.RequestException as e:
         logging.error(f'Request failed for work item {work_item_id}: {e}')
         return None
-    
+
+CONFLICT_STATUS_CODES = (409, 412)  # Work item changed since the revision the update was based on
+
+def _error_message(response):
+    try:
+        return response.json().get('message') or response.text
+    except ValueError:
+        return response.text
+
+def _assignee(work_item):
+    """Lower-cased unique name of the user a work item (or work item revision) is assigned to; '' if unassigned."""
+    assigned_to = (work_item.get('fields') or {}).get('System.AssignedTo') or {}
+    return str(assigned_to.get('uniqueName', '')).lower()
+
+async def _update_assigned_to_async(base_url, work_item_id, user_email, rev=None):
+    """
+    Assign one work item, guarding the update with a test on its revision when one is known.
+
+    On a revision conflict the work item is re-read. If it is already assigned to the user the update
+    counts as done. If someone else changed the assignee since the guarded revision, their change is
+    kept and the item is reported as a conflict. Otherwise only unrelated fields changed, and the update
+    is retried on the fresh revision, up to BULK_UPDATE_MAX_ATTEMPTS times.
+    Throttling and server errors are retried by the async client itself.
+
+    Returns:
+        dict: {"id", "email", "status": "Assigned" | "Conflict" | "Failed", "attempts", "http_status", "rev", "error"}.
+    """
+    item_url = f'{base_url}/wit/workitems/{work_item_id}'
+    headers = {'Content-Type': 'application/json-patch+json'}
+    result = {"id": work_item_id, "email": user_email, "status": "Failed", "attempts": 0,
+              "http_status": None, "rev": None, "error": None}
+    max_attempts = max(get_bulk_update_max_attempts(), 1)
+    expected_assignee = None  # Assignee at the guarded revision, read on the first conflict
+
+    try:
+        for attempt in range(1, max_attempts + 1):
+            result["attempts"] = attempt
+            payload = [{"op": "add", "path": "/fields/System.AssignedTo", "value": user_email}]
+            if rev is not None:
+                payload.insert(0, {"op": "test", "path": "/rev", "value": rev})
+
+            response = await devops_patch_async(f'{item_url}?api-version=7.1-preview.3', headers=headers, json=payload)
+            result["http_status"] = response.status_code
+            if response.status_code == 200:
+                result.update(status="Assigned", rev=response.json().get('rev'), error=None)
+                return result
+            if response.status_code not in CONFLICT_STATUS_CODES:
+                result["error"] = _error_message(response)
+                return result
+
+            # Revision conflict: compare the assignee now with the one the update was based on
+            result["error"] = f'Revision conflict: {_error_message(response)}'
+            current = await devops_get_async(f'{item_url}?fields=System.AssignedTo&api-version=7.1-preview.3')
+            if current.status_code != 200:
+                result.update(http_status=current.status_code, error=_error_message(current))
+                return result
+            current = current.json()
+            if _assignee(current) == str(user_email).lower():
+                result.update(status="Assigned", rev=current.get('rev'), error=None)
+                return result
+
+            if expected_assignee is None:
+                if rev is None:
+                    expected_assignee = _assignee(current)  # Nothing to protect without a revision
+                else:
+                    base = await devops_get_async(f'{item_url}/revisions/{rev}?api-version=7.1-preview.3')
+                    if base.status_code != 200:
+                        result.update(http_status=base.status_code, error=_error_message(base))
+                        return result
+                    expected_assignee = _assignee(base.json())
+            if _assignee(current) != expected_assignee:
+                result.update(status="Conflict", rev=current.get('rev'),
+                              error=f'Reassigned to {_assignee(current) or "nobody"} since revision {rev}')
+                return result
+
+            rev = current.get('rev')
+            await asyncio.sleep(0.1 * attempt)
+    except requests.exceptions.RequestException as e:
+        result["error"] = str(e)
+    return result
+
+def bulk_update_assigned_to(assignments):
+    """
+    Update the 'Assigned To' field of many work items, up to BULK_UPDATE_CONCURRENCY at once.
+    :param assignments: List of {"taskId", "email", optional "rev"} as posted by the tasks page;
+                        with "rev", an item reassigned by someone else since that revision is
+                        left alone and reported as "Conflict".
+    :return: List of per-item results in input order, see _update_assigned_to_async.
+    """
+    org, project = get_org_name(), get_project_name()
+    base_url = f'https://dev.azure.com/{org}/{project}/_apis'
+
+    async def update(assignment):
+        task_id, email = assignment.get('taskId'), assignment.get('email')
+        if not task_id or not email:
+            return {"id": task_id, "email": email, "status": "Failed", "attempts": 0,
+                    "http_status": None, "rev": None, "error": "Missing taskId or email"}
+        return await _update_assigned_to_async(base_url, task_id, email, assignment.get('rev'))
+
+    results = run_async(gather_bounded([update(assignment) for assignment in assignments], get_bulk_update_concurrency()))
+    assigned = sum(result["status"] == "Assigned" for result in results)
+    logging.info(f'Bulk update assigned {assigned} of {len(results)} work items')
+    if assigned:
+        work_item_cache.invalidate(org, project)
+    return results
+
 
 def calculate_priority_score(task):
     """
@@ -244,6 +313,73 @@ def calculate_priority_score(task):
     return score
 
 
+def _severity_value(severity_str):
+    """
+    Extracts the numeric severity from a string such as "2 - High", defaulting to medium (3).
+    """
+    try:
+        return int(severity_str.split(" - ")[0])
+    except (ValueError, AttributeError):
+        return 3
+
+def _factorize_exact(values):
+    """
+    Codes each distinct value like pd.factorize, keyed on (type, value) so that values which merely hash
+    equal, such as 2 and 2.0 or 1 and True, are kept apart and validated as the scalar code would.
+    :return: Tuple of (codes, distinct original values in order of appearance).
+    """
+    codes, uniques = pd.factorize(pd.Series([(type(value), value) for value in values], dtype="object"))
+    return codes, [value for _, value in uniques]
+
+def parse_due_dates(due_dates):
+    """
+    Parses ISO due dates into a Series of UTC datetimes; missing or invalid values become NaT.
+    Each distinct value is parsed once.
+    """
+    codes, uniques = _factorize_exact(due_dates)
+    uniques = pd.Series([value if isinstance(value, str) and value != "" else None for value in uniques], dtype="object")
+    try:
+        parsed = pd.to_datetime(uniques, utc=True, errors="coerce", format="ISO8601")
+    except (TypeError, ValueError):  # pandas < 2.0 has no "ISO8601" format but parses mixed ISO strings anyway
+        parsed = pd.to_datetime(uniques, utc=True, errors="coerce")
+    # take keeps the UTC dtype, even when every due date is missing
+    return parsed.take(codes).reset_index(drop=True)
+
+def calculate_priority_scores(tasks, now=None):
+    """
+    Calculates priority scores for a whole list of tasks at once, with the same rules as calculate_priority_score.
+    Fields are gathered into columns and scored with pandas/NumPy against a single "now" reference.
+    :param tasks: List of dictionaries representing tasks.
+    :param now: Timezone-aware reference time; defaults to the current UTC time.
+    :return: List of priority scores in the same order as tasks.
+    """
+    if not tasks:
+        return []
+    now = pd.Timestamp(now or datetime.now(timezone.utc))
+
+    # Only a handful of distinct priorities and severities occur, so validate each once and broadcast
+    codes, uniques = _factorize_exact([task.get("priority", 5) for task in tasks])
+    # Priority: integers from 1 to 5, anything else counts as the lowest priority (5)
+    priority_lookup = np.array(
+        [value if isinstance(value, int) and 1 <= value <= 5 else 5 for value in uniques], dtype=np.int64
+    )
+    priority = priority_lookup[codes]
+
+    # Severity: numeric part of e.g. "2 - High", defaulting to medium (3)
+    codes, uniques = _factorize_exact([task.get("severity", "3 - Medium") for task in tasks])
+    severity_lookup = np.array([_severity_value(value) for value in uniques], dtype=np.int64)
+    severity = severity_lookup[codes]
+
+    # Days until due: missing or invalid due dates are treated as 30 days from now
+    due_dates = parse_due_dates([task.get("due_date", None) for task in tasks])
+    due_dates = due_dates.fillna(now + pd.Timedelta(days=30))
+    days_until_due = np.maximum((due_dates - now).dt.days.to_numpy(), 0)
+
+    scores = (5 - priority) * 2 + (5 - severity) * 3 + np.maximum(0, 30 - days_until_due)
+    logging.debug(f'Calculated priority scores for {len(tasks)} tasks')
+    return scores.tolist()
+
+
 def calculate_total_priority_by_user(all_tasks, assignments):
     """
     Calculates the total priority score for each user based on their assigned tasks.
@@ -253,13 +389,19 @@ def calculate_total_priority_by_user(all_tasks, assignments):
     """
     total_priority_by_user = {}
     
+    # Tasks carry the assignee's display name, so map display names back to the email keys
+    email_by_display_name = {}
+
     # Initialize priority scores for all users
-    for user in assignments.keys():
+    for user, details in assignments.items():
         total_priority_by_user[user] = 0
+        if isinstance(details, dict) and details.get("displayName"):
+            email_by_display_name[details["displayName"]] = user
 
     # Sum up priority scores for each user's tasks
     for task in all_tasks:
         assigned_user = task.get("assigned_to")
+        assigned_user = email_by_display_name.get(assigned_user, assigned_user)
         if assigned_user in total_priority_by_user:
             total_priority_by_user[assigned_user] += task.get("priority_score", 0)
 
@@ -283,16 +425,12 @@ def validate_and_parse_json(data):
         logging.warning(f"Unexpected data type: {type(data)}. Defaulting to empty dictionary.")
         return {}
 
-def generate_gpt_task_assignment(unassigned_work_items, all_tasks):
+def build_assignment_context(all_tasks):
     """
-    Generates task assignments using GPT-4, considering a calculated priority score.
-    :param unassigned_work_items: List of unassigned work items.
+    Builds the workload context shared by all task assignment prompts.
     :param all_tasks: Dictionary containing tasks under the 'workItems' key.
-    :return: Generated task assignments as a string.
+    :return: Tuple of (tasks with priority scores and defaults, work item counts per user, total priority score per user).
     """
-    logging.debug(f'Generating GPT task assignment for unassigned work items: {unassigned_work_items}')
-    logging.debug(f'Raw all_tasks input: {all_tasks}')
-    
     # Extract the list of tasks from 'workItems'
     if isinstance(all_tasks, dict) and "workItems" in all_tasks:
         tasks = all_tasks["workItems"]
@@ -300,25 +438,12 @@ def generate_gpt_task_assignment(unassigned_work_items, all_tasks):
         logging.warning("all_tasks does not contain 'workItems', defaulting to empty list.")
         tasks = []
 
-    if isinstance(unassigned_work_items, dict) and "workItems" in unassigned_work_items:
-        unassigned_work_items = unassigned_work_items["workItems"]
-    else:
-        logging.warning("unassigned_work_items does not contain 'workItems', defaulting to empty list.")
-        unassigned_work_items = []
-
-    print(f"Extracted tasks from workItems: {tasks}")
-
     # Ensure all tasks are dictionaries
     tasks = [validate_and_parse_json(task) for task in tasks]
-    unassigned_work_items = [validate_and_parse_json(item) for item in unassigned_work_items]
-
-    print(f"Validated all_tasks: {tasks}")
-
-    # Calculate priority scores for all tasks
-    for task in tasks:
-        task["priority_score"] = calculate_priority_score(task)
 
-    print(f"All tasks after calculating priority scores: {tasks}")
+    # Calculate priority scores for all tasks in one vectorized pass
+    for task, score in zip(tasks, calculate_priority_scores(tasks)):
+        task["priority_score"] = score
 
     # Assign default values instead of removing fields
     tasks_with_defaults = []
@@ -334,14 +459,34 @@ def generate_gpt_task_assignment(unassigned_work_items, all_tasks):
         }
         tasks_with_defaults.append(task_with_defaults)
 
-    print(f"Tasks with defaults applied: {tasks_with_defaults}")
+    logging.debug(f'Tasks with defaults applied: {tasks_with_defaults}')
 
     # Compute user workload and total priority score
-    assignment_count_per_person = get_work_item_counts_for_all_users()
+    assignment_count_per_person = get_work_item_counts_for_all_users() or {}
     total_priority_by_user = calculate_total_priority_by_user(tasks_with_defaults, assignment_count_per_person)
 
-    print(f"Assignment count per person: {assignment_count_per_person}")
-    print(f"Total priority score by user: {total_priority_by_user}")
+    logging.debug(f'Assignment count per person: {assignment_count_per_person}')
+    logging.debug(f'Total priority score by user: {total_priority_by_user}')
+    return tasks_with_defaults, assignment_count_per_person, total_priority_by_user
+
+def generate_gpt_task_assignment(unassigned_work_items, all_tasks):
+    """
+    Generates task assignments using GPT-4, considering a calculated priority score.
+    :param unassigned_work_items: List of unassigned work items.
+    :param all_tasks: Dictionary containing tasks under the 'workItems' key.
+    :return: Generated task assignments as a string.
+    """
+    logging.debug(f'Generating GPT task assignment for unassigned work items: {unassigned_work_items}')
+    logging.debug(f'Raw all_tasks input: {all_tasks}')
+    
+    if isinstance(unassigned_work_items, dict) and "workItems" in unassigned_work_items:
+        unassigned_work_items = unassigned_work_items["workItems"]
+    else:
+        logging.warning("unassigned_work_items does not contain 'workItems', defaulting to empty list.")
+        unassigned_work_items = []
+
+    unassigned_work_items = [validate_and_parse_json(item) for item in unassigned_work_items]
+    tasks_with_defaults, assignment_count_per_person, total_priority_by_user = build_assignment_context(all_tasks)
 
     prompt = (
         f"Analyze the following unassigned work item(s): {unassigned_work_items}. "
@@ -404,3 +549,176 @@ def generate_gpt_task_assignment(unassigned_work_items, all_tasks):
     }
     
     return send_chat(prompt, context="Task assignment logic", model="gpt-4o-mini", schema=schema)
+
+# Rough tokens reserved in the response for each task's three recommendations
+RESPONSE_TOKENS_PER_TASK = 250
+
+def generate_local_task_assignments(task_ids, all_tasks):
+    """
+    Generates task assignments with the deterministic load-balancing solver instead of GPT.
+    :param task_ids: List of ids of the tasks to assign.
+    :param all_tasks: Dictionary containing tasks under the 'workItems' key.
+    :return: Dictionary mapping each task id to its assignments as a JSON string, in the same format as generate_gpt_task_assignment.
+    """
+    tasks_with_defaults, assignment_count_per_person, total_priority_by_user = build_assignment_context(all_tasks)
+    solved = solve_assignments(task_ids, tasks_with_defaults, assignment_count_per_person, total_priority_by_user)
+    return {task_id: json.dumps({"assignments": solved[task_id]}) for task_id in task_ids}
+
+def generate_gpt_task_assignments(task_ids, all_tasks, token_budget=None, pre_rank=False):
+    """
+    Generates task assignments for many tasks using one GPT call per chunk of tasks, up to OPENAI_CONCURRENCY at once.
+    The workload context is built once and the tasks are chunked so each prompt stays under the token budget.
+    If the context listing every task leaves no room for the largest task, a compact context with only the per-user
+    load is used instead; if even that does not fit, the local solver assigns the tasks without GPT.
+    :param task_ids: List of ids of the tasks to assign.
+    :param all_tasks: Dictionary containing tasks under the 'workItems' key.
+    :param token_budget: Approximate token limit per call; defaults to GPT_ASSIGNMENT_TOKEN_BUDGET.
+    :param pre_rank: If True, the local solver's candidates are included in the prompt for each task.
+    :return: Dictionary mapping each task id to its assignments as a JSON string, in the same format as generate_gpt_task_assignment.
+    """
+    tasks_with_defaults, assignment_count_per_person, total_priority_by_user = build_assignment_context(all_tasks)
+    tasks_by_id = {str(task["id"]): task for task in tasks_with_defaults}
+
+    ranked = {}
+    if pre_rank:
+        solved = solve_assignments(task_ids, tasks_with_defaults, assignment_count_per_person, total_priority_by_user)
+        ranked = {str(task_id): [candidate["email"] for candidate in candidates] for task_id, candidates in solved.items()}
+
+    workload_prompt = (
+        f"Current task assignments are as follows: {assignment_count_per_person}. "
+        f"Each task in {tasks_with_defaults} has a 'priority_score', calculated based on its priority, severity, "
+        f"and the number of days until the due date. Higher scores indicate greater urgency and importance. "
+        f"The total priority score for each user is as follows: {total_priority_by_user}. "
+    )
+    # Per-user aggregates only, for backlogs too large to list in every prompt
+    compact_workload_prompt = (
+        f"Current task assignments are as follows: {assignment_count_per_person}. "
+        f"The total priority score of the tasks assigned to each user is as follows: {total_priority_by_user}; "
+        f"priority scores are based on priority, severity, and the number of days until the due date, "
+        f"and higher scores indicate greater urgency and importance. "
+    )
+    instructions_prompt = (
+        "For EACH of the unassigned work items listed below, recommend 3 individuals, ensuring: "
+        "- The first two recommendations are balanced to prevent overloading any one person. "
+        "- Assignments align with expertise based on current tasks. "
+        "- The third recommendation should be someone with a lot of tasks to ensure critical tasks are among more seniors (Mention that user balances lots of task showing capability to handle critical taks). "
+        "Take into account the total priority score of tasks already assigned to each person, "
+        "and spread the listed work items so that assignments are equitable based on both task count and overall priority importance. "
+        "Provide only the email of each recommended individual and a concise explanation of your reasoning, "
+        "which must include task count, total priority importance, and priority score considerations. "
+        "Return one entry per work item using its task_id exactly as given. "
+    )
+
+    tasks_to_assign = []
+    for task_id in task_ids:
+        description = str(tasks_by_id.get(str(task_id), {"id": task_id}))
+        if ranked.get(str(task_id)):
+            description += f" (load-balanced candidates: {', '.join(ranked[str(task_id)])})"
+        line = f"task_id {task_id}: {description}. "
+        tasks_to_assign.append((str(task_id), line, count_tokens(line) + RESPONSE_TOKENS_PER_TASK))
+
+    # Pick the richest context that still leaves room for the largest task
+    budget = token_budget or get_gpt_assignment_token_budget()
+    largest_task = max((cost for _, _, cost in tasks_to_assign), default=0)
+    context_prompt = workload_prompt + instructions_prompt
+    if budget - count_tokens(context_prompt) < largest_task:
+        logging.warning(f'Listing every task exceeds the {budget} token budget; sending only the per-user load.')
+        context_prompt = compact_workload_prompt + instructions_prompt
+        if budget - count_tokens(context_prompt) < largest_task:
+            logging.warning(f'Task assignment prompts cannot fit the {budget} token budget; using the local solver instead.')
+            return generate_local_task_assignments(task_ids, all_tasks)
+    available = budget - count_tokens(context_prompt)
+
+    # Chunk the tasks so that context + task descriptions + expected output fit the budget
+    chunks, chunk, chunk_tokens = [], [], 0
+    for task_id, line, cost in tasks_to_assign:
+        if chunk and chunk_tokens + cost > available:
+            chunks.append(chunk)
+            chunk, chunk_tokens = [], 0
+        chunk.append(line)
+        chunk_tokens += cost
+    if chunk:
+        chunks.append(chunk)
+
+    schema = {
+        "name": "batch_task_assignment_response",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "tasks": {
+                    "type": "array",
+                    "description": "Recommendations for each unassigned work item",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "task_id": {
+                                "type": "string",
+                                "description": "Id of the unassigned work item"
+                            },
+                            "assignments": {
+                                "type": "array",
+                                "description": "List of individuals recommended for the work item",
+                                "items": {
+                                    "type": "object",
+                                    "properties": {
+                                        "email": {
+                                            "type": "string",
+                                            "description": "Email of the user selected for the assignment"
+                                        },
+                                        "display_name": {
+                                            "type": "string",
+                                            "description": "Display name of the user selected for the assignment"
+                                        },
+                                        "reason": {
+                                            "type": "string",
+                                            "description": "A short explanation of why the user is the best fit for the task"
+                                        }
+                                    },
+                                    "required": [
+                                        "email",
+                                        "display_name",
+                                        "reason"
+                                    ],
+                                    "additionalProperties": False
+                                }
+                            }
+                        },
+                        "required": [
+                            "task_id",
+                            "assignments"
+                        ],
+                        "additionalProperties": False
+                    }
+                }
+            },
+            "required": [
+                "tasks"
+            ],
+            "additionalProperties": False
+        },
+        "strict": True
+    }
+
+    prompts = []
+    for chunk in chunks:
+        prompt = context_prompt + "Unassigned work items: " + "".join(chunk)
+        logging.debug(f'Sending batch assignment prompt for {len(chunk)} tasks (~{count_tokens(prompt)} tokens)')
+        prompts.append(prompt)
+
+    # The chunks are independent, so they are sent concurrently on the async service loop
+    responses = run_async(gather_bounded(
+        [send_chat_async(prompt, context="Task assignment logic", model="gpt-4o-mini", schema=schema) for prompt in prompts],
+        get_openai_concurrency(),
+    ))
+
+    assignments_by_task = {}
+    for content in responses:
+        response = json.loads(content)
+        for entry in response.get("tasks", []):
+            assignments_by_task[str(entry.get("task_id"))] = entry.get("assignments", [])
+
+    # Keep the per-task output format of generate_gpt_task_assignment
+    return {
+        task_id: json.dumps({"assignments": assignments_by_task.get(str(task_id), [])})
+        for task_id in task_ids
+    }
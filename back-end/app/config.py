@@ -10,6 +10,41 @@ PROJECT_NAME = os.getenv('AZURE_DEVOPS_PROJECT_NAME', "TestProjectKenn")  # Defa
 PAT = os.getenv('AZURE_DEVOPS_PAT')  # Azure DevOps Personal Access Token
 JWT_TOKEN = os.getenv('AZURE_DEVOPS_JWT_TOKEN')  # JWT Token for authentication
 
+# Request Configuration
+AZURE_DEVOPS_POOL_SIZE = int(os.getenv('AZURE_DEVOPS_POOL_SIZE', 16))  # Keep-alive connections kept per host
+AZURE_DEVOPS_MAX_RETRIES = int(os.getenv('AZURE_DEVOPS_MAX_RETRIES', 3))  # Retries on 429/5xx responses
+AZURE_DEVOPS_BACKOFF_FACTOR = float(os.getenv('AZURE_DEVOPS_BACKOFF_FACTOR', 0.5))  # Exponential backoff base in seconds
+AZURE_DEVOPS_TIMEOUT = float(os.getenv('AZURE_DEVOPS_TIMEOUT', 30))  # Seconds before an Azure DevOps request times out
+WORK_ITEM_BATCH_CONCURRENCY = int(os.getenv('WORK_ITEM_BATCH_CONCURRENCY', 8))  # Max workitemsbatch pages fetched in parallel
+BULK_UPDATE_CONCURRENCY = int(os.getenv('BULK_UPDATE_CONCURRENCY', 8))  # Max work item updates in flight during a bulk update
+BULK_UPDATE_MAX_ATTEMPTS = int(os.getenv('BULK_UPDATE_MAX_ATTEMPTS', 3))  # Attempts per work item when its revision keeps changing
+
+# OpenAI Configuration
+GPT_ASSIGNMENT_TOKEN_BUDGET = int(os.getenv('GPT_ASSIGNMENT_TOKEN_BUDGET', 60000))  # Approximate tokens per batch assignment call
+OPENAI_CONCURRENCY = int(os.getenv('OPENAI_CONCURRENCY', 4))  # Max chat completions in flight at once for one request
+LLM_CACHE_MAX_BYTES = int(os.getenv('LLM_CACHE_MAX_BYTES', 16 * 1024 * 1024))  # Size of cached GPT responses kept in memory (0 disables)
+LLM_CACHE_DB_PATH = os.getenv('LLM_CACHE_DB_PATH', '')  # SQLite file GPT responses are also cached in (empty disables)
+LLM_CACHE_DB_MAX_BYTES = int(os.getenv('LLM_CACHE_DB_MAX_BYTES', 256 * 1024 * 1024))  # Size of cached GPT responses kept on disk
+
+# Assignment Configuration
+ASSIGNMENT_COUNT_WEIGHT = float(os.getenv('ASSIGNMENT_COUNT_WEIGHT', 10))  # Load added per assigned task by the local solver, next to priority scores
+
+# Cache Configuration
+WORK_ITEM_CACHE_TTL = int(os.getenv('WORK_ITEM_CACHE_TTL', 60))  # Seconds a work item snapshot is served from memory (0 disables)
+REPORT_CACHE_SIZE = int(os.getenv('REPORT_CACHE_SIZE', 8))  # Generated status reports kept in memory
+WORK_ITEM_FULL_SYNC_INTERVAL = int(os.getenv('WORK_ITEM_FULL_SYNC_INTERVAL', 3600))  # Seconds between full resyncs of the local work item store
+USER_DIRECTORY_TTL = int(os.getenv('USER_DIRECTORY_TTL', 600))  # Seconds an organization's user list is served from memory (0 disables)
+
+# Chatbot Configuration
+CHAT_MAX_SESSIONS = int(os.getenv('CHAT_MAX_SESSIONS', 200))  # Chat sessions kept in memory; least recently used ones are evicted
+CHAT_SESSION_IDLE_TIMEOUT = int(os.getenv('CHAT_SESSION_IDLE_TIMEOUT', 3600))  # Seconds before an unused chat session expires
+CHAT_SESSION_DB_PATH = os.getenv('CHAT_SESSION_DB_PATH', '')  # SQLite file chat sessions are persisted to (empty disables)
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv('CHAT_CONTEXT_TOKEN_BUDGET', 12000))  # Max tokens of history sent to the model per turn
+CHAT_TOOL_RESULT_TOKEN_LIMIT = int(os.getenv('CHAT_TOOL_RESULT_TOKEN_LIMIT', 400))  # Tokens kept of an older tool result once over budget
+CHAT_MAX_TOOL_ROUNDS = int(os.getenv('CHAT_MAX_TOOL_ROUNDS', 5))  # Rounds of tool calls the model may chain in one turn
+CHAT_TURN_TIME_BUDGET = float(os.getenv('CHAT_TURN_TIME_BUDGET', 90))  # Seconds of tool calling per turn before the model must answer
+CHAT_TOOL_WORKERS = int(os.getenv('CHAT_TOOL_WORKERS', 8))  # Threads running chatbot tool calls, shared by all sessions
+
 # Base URLs
 AZURE_DEVOPS_GRAPH_API_URL = f"https://vssps.dev.azure.com/{ORG_NAME}/_apis/graph"
 AZURE_DEVOPS_REST_API_URL = f"https://dev.azure.com/{ORG_NAME}/{PROJECT_NAME}/_apis"
@@ -33,6 +68,81 @@ def get_azure_devops_graph_api_url():
 def get_azure_devops_rest_api_url():
     return AZURE_DEVOPS_REST_API_URL
 
+def get_azure_devops_pool_size():
+    return AZURE_DEVOPS_POOL_SIZE
+
+def get_azure_devops_max_retries():
+    return AZURE_DEVOPS_MAX_RETRIES
+
+def get_azure_devops_backoff_factor():
+    return AZURE_DEVOPS_BACKOFF_FACTOR
+
+def get_azure_devops_timeout():
+    return AZURE_DEVOPS_TIMEOUT
+
+def get_work_item_batch_concurrency():
+    return WORK_ITEM_BATCH_CONCURRENCY
+
+def get_bulk_update_concurrency():
+    return BULK_UPDATE_CONCURRENCY
+
+def get_bulk_update_max_attempts():
+    return BULK_UPDATE_MAX_ATTEMPTS
+
+def get_gpt_assignment_token_budget():
+    return GPT_ASSIGNMENT_TOKEN_BUDGET
+
+def get_openai_concurrency():
+    return OPENAI_CONCURRENCY
+
+def get_llm_cache_max_bytes():
+    return LLM_CACHE_MAX_BYTES
+
+def get_llm_cache_db_path():
+    return LLM_CACHE_DB_PATH
+
+def get_llm_cache_db_max_bytes():
+    return LLM_CACHE_DB_MAX_BYTES
+
+def get_assignment_count_weight():
+    return ASSIGNMENT_COUNT_WEIGHT
+
+def get_work_item_cache_ttl():
+    return WORK_ITEM_CACHE_TTL
+
+def get_report_cache_size():
+    return REPORT_CACHE_SIZE
+
+def get_work_item_full_sync_interval():
+    return WORK_ITEM_FULL_SYNC_INTERVAL
+
+def get_user_directory_ttl():
+    return USER_DIRECTORY_TTL
+
+def get_chat_max_sessions():
+    return CHAT_MAX_SESSIONS
+
+def get_chat_session_idle_timeout():
+    return CHAT_SESSION_IDLE_TIMEOUT
+
+def get_chat_session_db_path():
+    return CHAT_SESSION_DB_PATH
+
+def get_chat_context_token_budget():
+    return CHAT_CONTEXT_TOKEN_BUDGET
+
+def get_chat_tool_result_token_limit():
+    return CHAT_TOOL_RESULT_TOKEN_LIMIT
+
+def get_chat_max_tool_rounds():
+    return CHAT_MAX_TOOL_ROUNDS
+
+def get_chat_turn_time_budget():
+    return CHAT_TURN_TIME_BUDGET
+
+def get_chat_tool_workers():
+    return CHAT_TOOL_WORKERS
+
 # Setters
 def set_org_name(value):
     global ORG_NAME, AZURE_DEVOPS_GRAPH_API_URL, AZURE_DEVOPS_REST_API_URL
@@ -53,4 +163,4 @@ def set_pat(value):
 
 def set_jwt_token(value):
     global JWT_TOKEN
-    JWT_TOKEN = value
\ No newline at end of file
+    JWT_TOKEN = value
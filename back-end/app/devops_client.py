@@ -0,0 +1,202 @@
+import logging
+import threading
+from collections import deque
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+from urllib3.util.retry import Retry
+from app.config import (
+    get_pat,
+    get_azure_devops_rest_api_url,
+    get_azure_devops_pool_size,
+    get_azure_devops_max_retries,
+    get_azure_devops_backoff_factor,
+    get_azure_devops_timeout,
+    get_work_item_batch_concurrency,
+)
+
+WORK_ITEM_BATCH_SIZE = 200  # Maximum number of ids accepted by workitemsbatch per request
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _create_session():
+    """
+    Build a requests.Session with a keep-alive connection pool and retries with
+    exponential backoff on throttling and server errors, honoring Retry-After.
+    """
+    retry = Retry(
+        total=get_azure_devops_max_retries(),
+        backoff_factor=get_azure_devops_backoff_factor(),
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(['GET', 'POST', 'PATCH']),
+        respect_retry_after_header=True,
+        raise_on_status=False,  # Hand the last response back so callers can log it
+    )
+    adapter = HTTPAdapter(
+        pool_connections=get_azure_devops_pool_size(),
+        pool_maxsize=get_azure_devops_pool_size(),
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session():
+    """Return the process-wide Azure DevOps session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _create_session()
+        return _session
+
+
+def devops_request(method, url, **kwargs):
+    """
+    Send a request to Azure DevOps through the shared session.
+
+    The PAT is sent as basic auth and the configured timeout applies unless
+    the caller passes its own auth or timeout.
+    """
+    kwargs.setdefault('auth', HTTPBasicAuth('', get_pat()))  # Empty username, PAT as the password
+    kwargs.setdefault('timeout', get_azure_devops_timeout())
+    return get_session().request(method, url, **kwargs)
+
+
+def devops_get(url, **kwargs):
+    return devops_request('GET', url, **kwargs)
+
+
+def devops_post(url, **kwargs):
+    return devops_request('POST', url, **kwargs)
+
+
+def devops_patch(url, **kwargs):
+    return devops_request('PATCH', url, **kwargs)
+
+
+def work_item_batch_url(base_url=None):
+    """URL of the workitemsbatch endpoint of a project; defaults to the current project."""
+    return f"{base_url or get_azure_devops_rest_api_url()}/wit/workitemsbatch?api-version=7.1-preview.1"
+
+
+def split_work_item_pages(work_item_ids):
+    """Split work item ids into workitemsbatch pages of WORK_ITEM_BATCH_SIZE ids."""
+    return [work_item_ids[i:i + WORK_ITEM_BATCH_SIZE] for i in range(0, len(work_item_ids), WORK_ITEM_BATCH_SIZE)]
+
+
+def work_item_batch_payload(batch_ids, fields=None, as_of=None):
+    """Body of a workitemsbatch request, optionally limited to some fields and read as of a point in time."""
+    payload = {"ids": batch_ids}
+    if fields:
+        payload["fields"] = list(fields)
+    if as_of:
+        payload["asOf"] = as_of
+    return payload
+
+
+def _fetch_work_item_page(details_url, batch_ids, fields=None, as_of=None):
+    """
+    Fetch one workitemsbatch page, optionally limited to some fields and read as of a point in time.
+
+    Returns:
+        list or None: Raw work items of the page, or None if Azure DevOps rejected the request.
+    """
+    details_payload = work_item_batch_payload(batch_ids, fields, as_of)
+    details_response = devops_post(details_url, json=details_payload)
+    logging.debug(f'Details URL: {details_url}')
+    logging.debug(f'Details Payload: {details_payload}')
+    logging.debug(f'Details Response Status Code: {details_response.status_code}')
+
+    if details_response.status_code != 200:
+        logging.error(f'Failed to fetch work item details: {details_response.status_code}')
+        logging.error(f'Response Content: {details_response.content.decode()}')
+        return None
+    return details_response.json().get('value', [])
+
+
+def iter_work_item_pages(work_item_ids, base_url=None, max_workers=None, fields=None, as_of=None):
+    """
+    Yield full details for a list of work item ids, one 200-id page at a time.
+
+    Pages are requested concurrently, bounded by WORK_ITEM_BATCH_CONCURRENCY, and yielded
+    in the original id order. At most that many pages are held in memory at once, so the
+    consumer can process (e.g. write out) each page before the next ones arrive.
+
+    Args:
+        work_item_ids (list): Work item ids, e.g. from a WIQL query.
+        base_url (str): REST API base URL of the project; defaults to the current project.
+        max_workers (int): Concurrency limit overriding the configured one.
+        fields (list): Reference names of the fields to return; defaults to all fields.
+        as_of (str): ISO 8601 UTC timestamp to read the work items as of; defaults to now.
+
+    Yields:
+        list or None: Raw work items of each page; None for a page that failed, after which iteration stops.
+
+    Raises:
+        requests.exceptions.RequestException: If a page request could not be sent.
+    """
+    if not work_item_ids:
+        return
+
+    details_url = work_item_batch_url(base_url)
+    pages = split_work_item_pages(work_item_ids)
+    workers = max(1, min(max_workers or get_work_item_batch_concurrency(), len(pages)))
+
+    if workers == 1:
+        for page in pages:
+            page_items = _fetch_work_item_page(details_url, page, fields, as_of)
+            yield page_items
+            if page_items is None:
+                return
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Keep a sliding window of in-flight pages and hand them out in submission (id) order
+        in_flight = deque()
+        next_page = 0
+        try:
+            while in_flight or next_page < len(pages):
+                while next_page < len(pages) and len(in_flight) < workers:
+                    in_flight.append(executor.submit(_fetch_work_item_page, details_url, pages[next_page], fields, as_of))
+                    next_page += 1
+                page_items = in_flight.popleft().result()
+                yield page_items
+                if page_items is None:
+                    return
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+
+def fetch_work_items_batch(work_item_ids, base_url=None, max_workers=None, fields=None, as_of=None):
+    """
+    Fetch full details for a list of work item ids.
+
+    The ids are split into pages of 200 which are requested concurrently, bounded by
+    WORK_ITEM_BATCH_CONCURRENCY, and reassembled in the original id order.
+
+    Args:
+        work_item_ids (list): Work item ids, e.g. from a WIQL query.
+        base_url (str): REST API base URL of the project; defaults to the current project.
+        max_workers (int): Concurrency limit overriding the configured one.
+        fields (list): Reference names of the fields to return; defaults to all fields.
+        as_of (str): ISO 8601 UTC timestamp to read the work items as of; defaults to now.
+
+    Returns:
+        list or None: Raw work items, or None if any page failed.
+
+    Raises:
+        requests.exceptions.RequestException: If a page request could not be sent.
+    """
+    all_work_items = []
+    for page_items in iter_work_item_pages(work_item_ids, base_url, max_workers, fields, as_of):
+        if page_items is None:
+            return None
+        all_work_items.extend(page_items)
+    return all_work_items
@@ -1,6 +1,5 @@
-import requests
-from app.config import AZURE_DEVOPS_REST_API_URL, PAT, ORG_NAME, get_project_name
-import base64
+from app.config import AZURE_DEVOPS_REST_API_URL, ORG_NAME, get_project_name
+from app.devops_client import devops_get
 def fetch_user_projects():
     """
     Fetch the list of projects a user is associated with in Azure DevOps.
@@ -14,15 +13,10 @@ def fetch_user_projects():
     API_VERSION = "7.1"  # Azure DevOps REST API version
     # Azure DevOps URL for organization-level projects
     url = f"https://dev.azure.com/{ORG_NAME}/_apis/projects?api-version={API_VERSION}"
-    auth_header = base64.b64encode(f":{PAT}".encode()).decode()
-    # Azure DevOps expects the Authorization header in Basic Auth format
-    headers = {
-        "Authorization": f"Basic {auth_header}",
-    }
 
     try:
         # Make the API request
-        response = requests.get(url, headers=headers)
+        response = devops_get(url)
 
         # Check for successful response
         if response.status_code == 200:
@@ -40,14 +34,9 @@ def get_current_project():
     API_VERSION = "7.1"  # Azure DevOps REST API version
     # Azure DevOps URL for organization-level projects
     url = f"https://dev.azure.com/{ORG_NAME}/_apis/projects/{get_project_name()}?api-version={API_VERSION}"
-    auth_header = base64.b64encode(f":{PAT}".encode()).decode()
-    # Azure DevOps expects the Authorization header in Basic Auth format
-    headers = {
-        "Authorization": f"Basic {auth_header}",
-    }
     try:
         # Make the API request
-        response = requests.get(url, headers=headers)
+        response = devops_get(url)
 
         # Check for successful response
         if response.status_code == 200:
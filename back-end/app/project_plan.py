@@ -1,93 +1,53 @@
-import requests
 import logging
-from requests.auth import HTTPBasicAuth
-from app.config import get_azure_devops_rest_api_url, PAT, get_project_name
+from app.config import get_project_name, get_org_name
+from app.work_item_cache import work_item_cache
+from app.work_item_sync import sync_work_items, get_store
 import pandas as pd
 from datetime import datetime
 
+def _get_work_item_snapshot(org, project):
+    """
+    Return the cached work item snapshot of a project, refreshing it incrementally on a miss.
+    """
+    snapshot = work_item_cache.get(org, project, "all_work_items")
+    if snapshot is None:
+        # Refresh incrementally: only items changed since the last sync are downloaded
+        work_items = sync_work_items(org, project)
+        if work_items is None:
+            return None
+        snapshot = {"workItems": work_items}
+        work_item_cache.set(org, project, "all_work_items", snapshot)
+    else:
+        logging.debug(f'Serving work items for {project} from cache')
+    return snapshot
+
 def fetch_all_work_items():
     """
-    Fetch all work items from Azure DevOps for a given project.
-    
-    Parameters:
-        azure_devops_url (str): Base URL for Azure DevOps REST API.
-        project_name (str): Name of the Azure DevOps project.
-        pat (str): Personal Access Token for authentication.
-    
+    Fetch all work items for the current project, serving repeat reads from the
+    shared snapshot cache until it expires or is invalidated.
+
     Returns:
         dict: A dictionary with work items, or None if an error occurred.
     """
-    url = f'{get_azure_devops_rest_api_url()}/wit/wiql?api-version=7.1-preview.2'
-    
-    auth = HTTPBasicAuth('', PAT)  # Empty username, PAT as the password
-
-    # Define the WIQL query
-    query = {
-        "query": f"""
-        SELECT [System.Id], [System.Title], [System.State], [System.AssignedTo], [System.TeamProject], [Microsoft.VSTS.Common.Priority], [Microsoft.VSTS.Common.Severity], [Microsoft.VSTS.Scheduling.DueDate]
-        FROM WorkItems
-        WHERE [System.TeamProject] = '{get_project_name()}'
-        ORDER BY [System.ChangedDate] DESC
-        """
-    }
+    snapshot = _get_work_item_snapshot(get_org_name(), get_project_name())
+    if snapshot is None:
+        return None
 
+    # Hand out copies so callers annotating tasks (e.g. priority_score) don't mutate the snapshot
+    return {"workItems": [dict(item) for item in snapshot["workItems"]]}
 
-    try:
-        logging.debug(f'WIQL Query URL: {url}')
-        logging.debug(f'WIQL Query Payload: {query}')
+def get_work_item_snapshot_version():
+    """
+    Return the version of the current project's work item snapshot, which changes whenever
+    any work item of the project changes. Useful as a key for caching derived results.
 
-        # Send POST request to execute the WIQL query
-        response = requests.post(url, auth=auth, json=query)
-        logging.debug(f'Response Status Code: {response.status_code}')
-        logging.debug(f'Response Content: {response.content.decode()}')
-        
-        if response.status_code == 200:
-            # Extract work item IDs from the response
-            work_item_refs = response.json().get('workItems', [])
-            work_item_ids = [item['id'] for item in work_item_refs]
-            logging.debug(f'Fetched Work Item IDs: {work_item_ids}')
-            
-            # Fetch full details for each work item in batches of 200
-            all_work_items = []
-            for i in range(0, len(work_item_ids), 200):
-                batch_ids = work_item_ids[i:i+200]
-                details_url = f"{get_azure_devops_rest_api_url()}/wit/workitemsbatch?api-version=7.1-preview.1"
-                details_payload = {"ids": batch_ids}
-                details_response = requests.post(details_url, auth=auth, json=details_payload)
-                logging.debug(f'Details URL: {details_url}')
-                logging.debug(f'Details Payload: {details_payload}')
-                logging.debug(f'Details Response Status Code: {details_response.status_code}')
-                logging.debug(f'Details Response Content: {details_response.content.decode()}')
-                
-                if details_response.status_code == 200:
-                    all_work_items.extend(details_response.json().get('value', []))
-                else:
-                    logging.error(f'Failed to fetch work item details: {details_response.status_code}')
-                    logging.error(f'Response Content: {details_response.content.decode()}')
-                    return None
-            
-            # Clean up the data
-            cleaned_work_items = [
-                {
-                    "id": item.get("id"),
-                    "title": item.get("fields", {}).get("System.Title", ""),
-                    "state": item.get("fields", {}).get("System.State", ""),
-                    "assigned_to": item.get("fields", {}).get("System.AssignedTo", {}).get("displayName", ""),
-                    "team_project": item.get("fields", {}).get("System.TeamProject", ""),
-                    "priority": item.get("fields", {}).get("Microsoft.VSTS.Common.Priority", ""),
-                    "severity": item.get("fields", {}).get("Microsoft.VSTS.Common.Severity", ""),
-                    "due_date": item.get("fields", {}).get("Microsoft.VSTS.Scheduling.DueDate", "")
-                }
-                for item in all_work_items
-            ]
-            return {"workItems": cleaned_work_items}
-        else:
-            logging.error(f'Failed to execute WIQL query: {response.status_code}')
-            logging.error(f'Response Content: {response.content.decode()}')
-            return None
-    except requests.exceptions.RequestException as e:
-        logging.error(f'Request failed: {e}')
+    Returns:
+        int: The snapshot version, or None if the snapshot could not be refreshed.
+    """
+    org, project = get_org_name(), get_project_name()
+    if _get_work_item_snapshot(org, project) is None:
         return None
+    return get_store(org, project).version
 
 def generate_ms_project_plan(work_items):
     """
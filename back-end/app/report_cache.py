@@ -0,0 +1,73 @@
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from app.config import get_report_cache_size
+
+
+def report_cache_key(*parts):
+    """Content address of a report: a hash of everything its contents depend on."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class ReportCache:
+    """
+    Content-addressed cache of generated reports.
+
+    Reports are kept in memory as bytes in LRU order, up to REPORT_CACHE_SIZE entries.
+    Concurrent requests for a report that is being built wait for that build instead of
+    starting their own.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reports = OrderedDict()  # key -> report bytes
+        self._builds = {}  # key -> Future of the in-flight build
+
+    def get_or_build(self, key, build):
+        """
+        Return the cached report for key, building it with build() on a miss.
+
+        Args:
+            key (str): Content address from report_cache_key.
+            build (callable): Returns the report bytes, or None on failure (failures are not cached).
+
+        Returns:
+            bytes or None: The report, or None if the build failed.
+        """
+        with self._lock:
+            if key in self._reports:
+                self._reports.move_to_end(key)
+                logging.debug(f'Serving report {key[:12]} from cache')
+                return self._reports[key]
+            future = self._builds.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._builds[key] = future
+
+        if not owner:
+            logging.debug(f'Waiting for in-flight build of report {key[:12]}')
+            return future.result()
+
+        try:
+            report = build()
+        except BaseException as e:
+            with self._lock:
+                self._builds.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._builds.pop(key, None)
+            if report is not None:
+                self._reports[key] = report
+                while len(self._reports) > max(get_report_cache_size(), 0):
+                    self._reports.popitem(last=False)
+        future.set_result(report)
+        return report
+
+
+# Shared instance used by the report routes
+report_cache = ReportCache()
@@ -1,14 +1,84 @@
 from app.project_plan import fetch_all_work_items
+import asyncio
 import logging
-from  app.automated_task_assignment import calculate_priority_score,validate_and_parse_json, get_all_users, clean_user_data
-import logging
-from datetime import datetime, timedelta
-from helper.chatgpt import send_chat
+from  app.automated_task_assignment import calculate_priority_scores, parse_due_dates, validate_and_parse_json, get_all_users_async
+from app.async_service import run_async
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+from helper.chatgpt import send_chat_async
 from flask import jsonify
-def filter_risk_items():
-    all_tasks = fetch_all_work_items()
-    risk = []
-    all_users = get_all_users()
+
+# Default rules for partition_risk_items
+DEFAULT_RISK_RULES = {
+    "due_window_days": 7,  # Tasks due within this many days are at risk
+    "score_percentile": None,  # Remaining tasks scoring above this percentile are at risk (None: above the average)
+    "exclude_states": [],  # States that are never at risk, e.g. ["Done", "Closed"]
+}
+
+def partition_risk_items(tasks, rules=None, now=None):
+    """
+    Splits tasks into risk items and the rest in linear time.
+
+    A task is at risk if it is due within the due window, or if among the remaining tasks its
+    priority score is above the average (or the configured percentile).
+    :param tasks: List of task dictionaries; a 'priority_score' is added to each.
+    :param rules: Dictionary overriding DEFAULT_RISK_RULES.
+    :param now: Timezone-aware reference time; defaults to the current UTC time.
+    :return: Tuple (risk, rest); risk lists due-soon tasks first, then high-score tasks, each in input order.
+    """
+    rules = {**DEFAULT_RISK_RULES, **(rules or {})}
+    now = pd.Timestamp(now or datetime.now(timezone.utc))
+    if not tasks:
+        logging.warning("No tasks available to calculate average priority score.")
+        return [], []
+
+    scores = np.array(calculate_priority_scores(tasks, now=now))
+    for task, score in zip(tasks, scores.tolist()):
+        task["priority_score"] = score
+
+    excluded_states = set(rules["exclude_states"] or [])
+    eligible = np.array([task.get("state") not in excluded_states for task in tasks], dtype=bool)
+
+    due_dates = parse_due_dates([task.get("due_date") or task.get("dueDate") for task in tasks])
+    window_end = now + pd.Timedelta(days=rules["due_window_days"])
+    due_soon = eligible & ((due_dates >= now) & (due_dates <= window_end)).to_numpy()
+
+    remaining = eligible & ~due_soon
+    high_score = np.zeros(len(tasks), dtype=bool)
+    if remaining.any():
+        if rules["score_percentile"] is None:
+            threshold = scores[remaining].mean()
+        else:
+            threshold = np.percentile(scores[remaining], rules["score_percentile"])
+        high_score = remaining & (scores > threshold)
+    else:
+        logging.warning("No tasks available to calculate average priority score.")
+
+    risk = [task for task, flag in zip(tasks, due_soon) if flag]
+    risk += [task for task, flag in zip(tasks, high_score) if flag]
+    rest = [task for task, flag in zip(tasks, due_soon | high_score) if not flag]
+    return risk, rest
+
+def filter_risk_items(rules=None, use_gpt=True):
+    """
+    Identifies the project's risk items.
+    :param rules: Dictionary overriding DEFAULT_RISK_RULES.
+    :param use_gpt: If True, GPT formats the top high-risk tasks; otherwise the partitioned risk list is returned directly.
+    :return: GPT response as a JSON string, or the list of risk items when use_gpt is False.
+    """
+    return run_async(filter_risk_items_async(rules, use_gpt))
+
+async def filter_risk_items_async(rules=None, use_gpt=True):
+    """
+    Async version of filter_risk_items, for use on the async service loop.
+    The work items and, when GPT is used, the users are fetched concurrently.
+    """
+    if use_gpt:
+        # Users are only needed for GPT to match assignees to emails
+        all_tasks, all_users = await asyncio.gather(asyncio.to_thread(fetch_all_work_items), get_all_users_async())
+    else:
+        all_tasks = await asyncio.to_thread(fetch_all_work_items)
     if isinstance(all_tasks, dict) and "workItems" in all_tasks:
         tasks = all_tasks["workItems"]
     else:
@@ -16,34 +86,10 @@ def filter_risk_items():
         tasks = []
 
     tasks = [validate_and_parse_json(task) for task in tasks]
+    risk, _ = partition_risk_items(tasks, rules)
+    if not use_gpt:
+        return risk
 
-    now = datetime.now()
-    seven_days_from_now = now + timedelta(days=7)
-    
-    for task in tasks:
-        task["priority_score"] = calculate_priority_score(task)
-
-    for task in tasks[:]:
-        due_date_str = task.get("dueDate")
-        if due_date_str:
-            try:
-                due_date = datetime.strptime(due_date_str, "%Y-%m-%d")
-                if now <= due_date <= seven_days_from_now:
-                    risk.append(task)
-                    tasks.remove(task)
-            except ValueError:
-                logging.warning(f"Invalid date format for task: {task}")
-    
-    if tasks:
-        average_priority_score = sum(task["priority_score"] for task in tasks) / len(tasks)
-        high_priority_tasks = [task for task in tasks if task["priority_score"] > average_priority_score]
-        
-        for task in high_priority_tasks:
-            risk.append(task)
-            tasks.remove(task)
-    else:
-        logging.warning("No tasks available to calculate average priority score.")
-    
     schema = {
     "name": "item_list",
     "schema": {
@@ -133,5 +179,5 @@ def filter_risk_items():
     )
     
 
-    return send_chat(prompt, context="Task assignment logic", schema=schema)
+    return await send_chat_async(prompt, context="Task assignment logic", schema=schema)
 
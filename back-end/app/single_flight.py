@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent fetches.
+
+    The first caller for a key runs the fetch; callers arriving while it is in flight wait for
+    it and share its result or exception. Nothing is kept once the flight lands, so the next
+    caller fetches again. Results are shared objects and must not be mutated by callers.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}  # key -> Future of the in-flight fetch
+
+    def _join(self, key):
+        """Return (future, owner) for key, registering a new flight if none is in the air."""
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._flights[key] = future
+            return future, True
+
+    def _land(self, key, future, result=None, error=None):
+        with self._lock:
+            self._flights.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fetch):
+        """
+        Run fetch(), or wait for the identical fetch already in flight.
+
+        Args:
+            key (tuple): Identity of the fetch, e.g. (org, project, query, fields); must be hashable.
+            fetch (callable): Performs the fetch.
+
+        Returns:
+            The result of fetch().
+        """
+        future, owner = self._join(key)
+        if not owner:
+            logging.debug(f'Joining in-flight fetch {key[0]}')
+            return future.result()
+        try:
+            result = fetch()
+        except BaseException as e:
+            self._land(key, future, error=e)
+            raise
+        self._land(key, future, result)
+        return result
+
+    async def do_async(self, key, fetch):
+        """
+        Async version of do, sharing flights with synchronous callers.
+
+        Args:
+            key (tuple): Identity of the fetch; must be hashable.
+            fetch (callable): Returns the coroutine performing the fetch.
+        """
+        future, owner = self._join(key)
+        if not owner:
+            logging.debug(f'Joining in-flight fetch {key[0]}')
+            return await asyncio.wrap_future(future)
+        try:
+            result = await fetch()
+        except BaseException as e:
+            self._land(key, future, error=e)
+            raise
+        self._land(key, future, result)
+        return result
+
+
+# Shared instance used by the Azure DevOps fetchers
+single_flight = SingleFlight()
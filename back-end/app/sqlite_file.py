@@ -0,0 +1,34 @@
+import sqlite3
+from contextlib import contextmanager, closing
+
+
+class SQLiteFile:
+    """
+    Optional SQLite file backing a persistent store, such as the chat sessions or the LLM response cache.
+
+    The path is read from the configuration on every use, so an empty path turns persistence off.
+    The schema statements run the first time each path is opened.
+    """
+    def __init__(self, get_db_path, schema):
+        """
+        :param get_db_path: Getter returning the path of the SQLite file, or '' when persistence is off.
+        :param schema: CREATE ... IF NOT EXISTS statements of the store's tables and indexes.
+        """
+        self._get_db_path = get_db_path
+        self._schema = schema
+        self._ready = None  # Path of the SQLite file whose schema has been created
+
+    @contextmanager
+    def connect(self):
+        """Open the SQLite file in a transaction committed on a clean exit; yields None if persistence is off."""
+        db_path = self._get_db_path()
+        if not db_path:
+            yield None
+            return
+        with closing(sqlite3.connect(db_path, timeout=10)) as connection:
+            with connection:
+                if self._ready != db_path:
+                    for statement in self._schema:
+                        connection.execute(statement)
+                    self._ready = db_path
+                yield connection
@@ -1,30 +1,60 @@
 import requests
-from requests.auth import HTTPBasicAuth
-from app.config import PAT, get_project_name, get_azure_devops_rest_api_url
+from app.config import get_project_name, get_org_name
 import logging
-
-
-def count_work_items_by_state():
+from app.devops_client import devops_post
+from app.async_service import run_async, fetch_work_items_batch_async
+from app.work_item_cache import work_item_cache
+from app.single_flight import single_flight
+
+
+def _assignee_of(fields):
+    assigned_to = fields.get('System.AssignedTo')
+    if not assigned_to:
+        return 'Unassigned'
+    return assigned_to.get('uniqueName') or assigned_to.get('displayName', 'Unknown')
+
+
+# Group-by dimensions supported by summarize_work_items, each mapping a work item's fields to its bucket
+STATS_DIMENSIONS = {
+    "state": lambda fields: fields.get('System.State', 'Unknown'),
+    "type": lambda fields: fields.get('System.WorkItemType', 'Unknown'),
+    "assignment": lambda fields: 'assigned' if fields.get('System.AssignedTo') else 'unassigned',
+    "assignee": _assignee_of,
+    "area_path": lambda fields: fields.get('System.AreaPath', 'Unknown'),
+    "iteration": lambda fields: fields.get('System.IterationPath', 'Unknown'),
+}
+
+# Fields read by STATS_DIMENSIONS, the only ones requested from workitemsbatch
+STATS_FIELDS = [
+    'System.Id',
+    'System.State',
+    'System.WorkItemType',
+    'System.AssignedTo',
+    'System.AreaPath',
+    'System.IterationPath',
+]
+
+
+def _aggregate_work_items(org, project):
     """
-    Count work items from Azure DevOps grouped by their state without filtering by due date.
-    
+    Fetch the project's work items once and count them along every dimension in STATS_DIMENSIONS.
+
     Returns:
-        Optional[Dict[str, int]]: A dictionary with states as keys and their counts as values, or None on failure.
+        Optional[Dict]: {"total": int, <dimension>: {bucket: count}}, or None on failure.
     """
-    url = f'{get_azure_devops_rest_api_url()}/wit/wiql?api-version=7.1-preview.2'
-    auth = HTTPBasicAuth('', PAT)  # Empty username, PAT as the password
+    base_url = f'https://dev.azure.com/{org}/{project}/_apis'
+    url = f'{base_url}/wit/wiql?api-version=7.1-preview.2'
 
     query = {
         "query": f"""
-        SELECT [System.Id], [System.State]
+        SELECT [System.Id]
         FROM WorkItems
-        WHERE [System.TeamProject] = '{get_project_name()}'
+        WHERE [System.TeamProject] = '{project}'
         ORDER BY [System.ChangedDate] DESC
         """
     }
-    print(get_project_name())
     try:
-        response = requests.post(url, auth=auth, json=query)
+        response = devops_post(url, json=query)
         if response.status_code != 200:
             logging.error(f'Failed to execute WIQL query: {response.status_code}')
             return None
@@ -32,136 +62,93 @@ def count_work_items_by_state():
         work_item_refs = response.json().get('workItems', [])
         work_item_ids = [item['id'] for item in work_item_refs]
 
+        summary = {dimension: {} for dimension in STATS_DIMENSIONS}
+        summary['assignment'] = {'assigned': 0, 'unassigned': 0}
+        summary['total'] = len(work_item_ids)
         if not work_item_ids:
             logging.info("No work items found.")
-            return {}
+            return summary
 
-        # Fetch details in batches
-        state_counts = {}
-        for i in range(0, len(work_item_ids), 200):
-            batch_ids = work_item_ids[i:i+200]
-            details_url = f"{get_azure_devops_rest_api_url()}/wit/workitemsbatch?api-version=7.1-preview.1"
-            details_payload = {"ids": batch_ids}
-
-            details_response = requests.post(details_url, auth=auth, json=details_payload)
-            if details_response.status_code != 200:
-                logging.error(f'Failed to fetch work item details: {details_response.status_code}')
-                return None
+        # Fetch only the counted fields as concurrent batches on the async service loop
+        work_items = run_async(fetch_work_items_batch_async(work_item_ids, base_url=base_url, fields=STATS_FIELDS))
+        if work_items is None:
+            return None
 
-            for work_item in details_response.json().get('value', []):
-                state = work_item.get('fields', {}).get('System.State', 'Unknown')
-                state_counts[state] = state_counts.get(state, 0) + 1
+        # Single pass over the work items, bumping one bucket per dimension
+        for work_item in work_items:
+            fields = work_item.get('fields', {})
+            for dimension, bucket_of in STATS_DIMENSIONS.items():
+                counts = summary[dimension]
+                bucket = bucket_of(fields)
+                counts[bucket] = counts.get(bucket, 0) + 1
 
-        return state_counts
+        return summary
     except requests.exceptions.RequestException as e:
         logging.error(f'Request failed: {e}')
         return None
 
-def count_work_items_by_assignment():
+def summarize_work_items(group_by=None):
     """
-    Count work items from Azure DevOps grouped by assigned vs unassigned.
-    
+    Count work items of the current project along any set of dimensions from a single fetch.
+
+    Args:
+        group_by (list): Dimensions to include (see STATS_DIMENSIONS); defaults to all of them.
+
     Returns:
-        Optional[Dict[str, int]]: A dictionary with assigned,unassigned as keys and their counts as values, or None on failure.
-    """
-    url = f'{get_azure_devops_rest_api_url()}/wit/wiql?api-version=7.1-preview.2'
-    auth = HTTPBasicAuth('', PAT)  # Empty username, PAT as the password
+        Optional[Dict]: {"total": int, <dimension>: {bucket: count}}, or None on failure.
 
-    query = {
-        "query": f"""
-        SELECT [System.Id], [System.State]
-        FROM WorkItems
-        WHERE [System.TeamProject] = '{get_project_name()}'
-        ORDER BY [System.ChangedDate] DESC
-        """
-    }
-    print(get_project_name())
-    try:
-        response = requests.post(url, auth=auth, json=query)
-        if response.status_code != 200:
-            logging.error(f'Failed to execute WIQL query: {response.status_code}')
+    Raises:
+        ValueError: If an unknown dimension is requested.
+    """
+    group_by = list(group_by or STATS_DIMENSIONS)
+    unknown = [dimension for dimension in group_by if dimension not in STATS_DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown group_by dimension(s): {', '.join(unknown)}")
+
+    org, project = get_org_name(), get_project_name()
+    summary = work_item_cache.get(org, project, "stats_summary")
+    if summary is None:
+        # Concurrent cache misses (e.g. the dashboard's stats widgets loading at once) share one fetch
+        summary = single_flight.do(
+            ('stats_summary', org, project, tuple(STATS_FIELDS)), lambda: _aggregate_work_items(org, project))
+        if summary is None:
             return None
+        work_item_cache.set(org, project, "stats_summary", summary)
 
-        work_item_refs = response.json().get('workItems', [])
-        work_item_ids = [item['id'] for item in work_item_refs]
+    result = {"total": summary["total"]}
+    for dimension in group_by:
+        result[dimension] = dict(summary[dimension])
+    return result
 
-        if not work_item_ids:
-            logging.info("No work items found.")
-            return {}
-
-        # Fetch details in batches
-        assignment_counts = {'assigned': 0, 'unassigned': 0}
-        for i in range(0, len(work_item_ids), 200):
-            batch_ids = work_item_ids[i:i+200]
-            details_url = f"{get_azure_devops_rest_api_url()}/wit/workitemsbatch?api-version=7.1-preview.1"
-            details_payload = {"ids": batch_ids}
-
-            details_response = requests.post(details_url, auth=auth, json=details_payload)
-            if details_response.status_code != 200:
-                logging.error(f'Failed to fetch work item details: {details_response.status_code}')
-                return None
-
-            for work_item in details_response.json().get('value', []):
-                assigned_to = work_item.get('fields', {}).get('System.AssignedTo')
-                if assigned_to:
-                    assignment_counts['assigned'] += 1
-                else:
-                    assignment_counts['unassigned'] += 1
-
-        return assignment_counts
-    except requests.exceptions.RequestException as e:
-        logging.error(f'Request failed: {e}')
+def _count_work_items_by(dimension):
+    summary = summarize_work_items([dimension])
+    if summary is None:
         return None
+    return summary[dimension] if summary["total"] else {}
 
-def count_work_items_by_type():
+def count_work_items_by_state():
     """
     Count work items from Azure DevOps grouped by their state without filtering by due date.
-    
+
     Returns:
         Optional[Dict[str, int]]: A dictionary with states as keys and their counts as values, or None on failure.
     """
-    url = f'{get_azure_devops_rest_api_url()}/wit/wiql?api-version=7.1-preview.2'
-    auth = HTTPBasicAuth('', PAT)  # Empty username, PAT as the password
-
-    query = {
-        "query": f"""
-        SELECT [System.Id], [System.WorkItemType]
-        FROM WorkItems
-        WHERE [System.TeamProject] = '{get_project_name()}'
-        ORDER BY [System.ChangedDate] DESC
-        """
-    }
-
-    try:
-        response = requests.post(url, auth=auth, json=query)
-        if response.status_code != 200:
-            logging.error(f'Failed to execute WIQL query: {response.status_code}')
-            return None
-
-        work_item_refs = response.json().get('workItems', [])
-        work_item_ids = [item['id'] for item in work_item_refs]
+    return _count_work_items_by("state")
 
-        if not work_item_ids:
-            logging.info("No work items found.")
-            return {}
-
-        # Fetch details in batches
-        state_counts = {}
-        for i in range(0, len(work_item_ids), 200):
-            batch_ids = work_item_ids[i:i+200]
-            details_url = f"{get_azure_devops_rest_api_url()}/wit/workitemsbatch?api-version=7.1-preview.1"
-            details_payload = {"ids": batch_ids}
+def count_work_items_by_assignment():
+    """
+    Count work items from Azure DevOps grouped by assigned vs unassigned.
 
-            details_response = requests.post(details_url, auth=auth, json=details_payload)
-            if details_response.status_code != 200:
-                logging.error(f'Failed to fetch work item details: {details_response.status_code}')
-                return None
+    Returns:
+        Optional[Dict[str, int]]: A dictionary with assigned,unassigned as keys and their counts as values, or None on failure.
+    """
+    return _count_work_items_by("assignment")
 
-            for work_item in details_response.json().get('value', []):
-                state = work_item.get('fields', {}).get('System.WorkItemType', 'Unknown')
-                state_counts[state] = state_counts.get(state, 0) + 1
+def count_work_items_by_type():
+    """
+    Count work items from Azure DevOps grouped by their work item type.
 
-        return state_counts
-    except requests.exceptions.RequestException as e:
-        logging.error(f'Request failed: {e}')
-        return None
\ No newline at end of file
+    Returns:
+        Optional[Dict[str, int]]: A dictionary with types as keys and their counts as values, or None on failure.
+    """
+    return _count_work_items_by("type")
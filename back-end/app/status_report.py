@@ -1,76 +1,129 @@
 import requests
-from requests.auth import HTTPBasicAuth
-from app.config import get_azure_devops_rest_api_url, PAT, get_org_name, get_project_name
+from app.config import get_azure_devops_rest_api_url, get_org_name, get_project_name
 import logging
-import pandas as pd
-from datetime import datetime, timedelta
+from app.devops_client import fetch_work_items_batch, iter_work_item_pages, devops_post
+from app.project_plan import get_work_item_snapshot_version
+from app.report_cache import report_cache, report_cache_key
+from app.single_flight import single_flight
+import os
+import tempfile
+import xlsxwriter
+from datetime import datetime, timedelta, timezone
 
-def fetch_pending_tasks(due_date):
+# Fields read for pending tasks, covering the pending tasks route and every status report column
+PENDING_TASK_FIELDS = [
+    'System.Id',
+    'System.Title',
+    'System.State',
+    'System.AssignedTo',
+    'Microsoft.VSTS.Scheduling.DueDate',
+    'System.CreatedBy',
+    'Microsoft.VSTS.Common.Priority',
+    'Microsoft.VSTS.Common.Severity',
+]
+
+def _query_pending_task_ids(due_before=None, due_after=None, as_of=None):
     """
-    Fetch work items from Azure DevOps that are not marked as done and have a due date past the specified date.
-    
+    Run the WIQL query for work items of the current project that are not marked as done
+    and are due within a window, so the filtering happens server side.
+
     Args:
-        due_date (str): The date in YYYY-MM-DD format to filter tasks with due dates past this value.
-    
+        due_before (str): Only tasks due on or before this YYYY-MM-DD date.
+        due_after (str): Only tasks due after this YYYY-MM-DD date.
+        as_of (str): ISO 8601 UTC timestamp to run the query as of; defaults to now.
+
     Returns:
-        dict or None: A dictionary of work items or None in case of failure.
+        list or None: Work item ids, or None in case of failure.
     """
     url = f'https://dev.azure.com/{get_org_name()}/{get_project_name()}/_apis/wit/wiql?api-version=7.1-preview.2'
-    auth = HTTPBasicAuth('', PAT)  # Empty username, PAT as the password
-    due_date = datetime.today().strftime('%Y-%m-%d')
+
+    due_filter = ""
+    if due_after:
+        due_filter += f"AND [Microsoft.VSTS.Scheduling.DueDate] > '{due_after}'\n"
+    if due_before:
+        due_filter += f"AND [Microsoft.VSTS.Scheduling.DueDate] <= '{due_before}'\n"
+    as_of_clause = f"ASOF '{as_of}'" if as_of else ""
 
     # Define the WIQL query
     query = {
         "query": f"""
-        SELECT [System.Id], [System.Title], [System.State], [System.AssignedTo], [Microsoft.VSTS.Scheduling.DueDate]
+        SELECT [System.Id]
         FROM WorkItems
-        WHERE [System.State] <> 'Done'
-        AND [Microsoft.VSTS.Scheduling.DueDate] > '{due_date}'
+        WHERE [System.TeamProject] = '{get_project_name()}'
+        AND [System.State] <> 'Done'
+        {due_filter}
         ORDER BY [System.ChangedDate] DESC
+        {as_of_clause}
         """
     }
 
+    # Send POST request to execute the WIQL query
+    response = devops_post(url, json=query)
+    logging.debug(f'WIQL Query URL: {url}')
+    logging.debug(f'WIQL Query Payload: {query}')
+    logging.debug(f'Response Status Code: {response.status_code}')
+
+    if response.status_code == 200:
+        # Extract work item IDs from the response
+        work_item_refs = response.json().get('workItems', [])
+        work_item_ids = [item['id'] for item in work_item_refs]
+        logging.debug(f'Fetched {len(work_item_ids)} pending work item IDs')
+        return work_item_ids
+    else:
+        logging.error(f'Failed to execute WIQL query: {response.status_code}')
+        logging.error(f'Response Content: {response.content.decode()}')
+        return None
+
+def _valid_date(date, default):
+    """Return date if it is a YYYY-MM-DD string, otherwise default, so it is safe to put into WIQL."""
     try:
-        # Send POST request to execute the WIQL query
-        response = requests.post(url, auth=auth, json=query)
-        logging.debug(f'WIQL Query URL: {url}')
-        logging.debug(f'WIQL Query Payload: {query}')
-        logging.debug(f'Response Status Code: {response.status_code}')
-        logging.debug(f'Response Content: {response.content.decode()}')
-        
-        if response.status_code == 200:
-            # Extract work item IDs from the response
-            work_item_refs = response.json().get('workItems', [])
-            work_item_ids = [item['id'] for item in work_item_refs]
+        datetime.strptime(date, '%Y-%m-%d')
+        return date
+    except (TypeError, ValueError):
+        logging.warning(f'Invalid date {date!r}, using {default} instead.')
+        return default
+
+def _fetch_pending_work_items(due_before=None, due_after=None):
+    """
+    Fetch the pending tasks of the current project due within a window.
+    Concurrent calls for the same project and window share one fetch.
+
+    Returns:
+        list or None: Work items with PENDING_TASK_FIELDS, or None in case of failure.
+    """
+    def fetch():
+        try:
+            work_item_ids = _query_pending_task_ids(due_before=due_before, due_after=due_after)
+            if work_item_ids is None:
+                return None
             logging.debug(f'Fetched Work Item IDs: {work_item_ids}')
-            
-            # Fetch full details for each work item in batches of 200
-            all_work_items = []
-            for i in range(0, len(work_item_ids), 200):
-                batch_ids = work_item_ids[i:i+200]
-                details_url = f"https://dev.azure.com/{get_org_name()}/{get_project_name()}/_apis/wit/workitemsbatch?api-version=7.1-preview.1"
-                details_payload = {"ids": batch_ids}
-                details_response = requests.post(details_url, auth=auth, json=details_payload)
-                logging.debug(f'Details URL: {details_url}')
-                logging.debug(f'Details Payload: {details_payload}')
-                logging.debug(f'Details Response Status Code: {details_response.status_code}')
-                logging.debug(f'Details Response Content: {details_response.content.decode()}')
-                
-                if details_response.status_code == 200:
-                    all_work_items.extend(details_response.json().get('value', []))
-                else:
-                    logging.error(f'Failed to fetch work item details: {details_response.status_code}')
-                    logging.error(f'Response Content: {details_response.content.decode()}')
-                    return None
-            
-            return {"workItems": all_work_items}
-        else:
-            logging.error(f'Failed to execute WIQL query: {response.status_code}')
-            logging.error(f'Response Content: {response.content.decode()}')
+
+            # Fetch only the fields in use, 200 ids per concurrent batch request
+            return fetch_work_items_batch(work_item_ids, fields=PENDING_TASK_FIELDS)
+        except requests.exceptions.RequestException as e:
+            logging.error(f'Request failed: {e}')
             return None
-    except requests.exceptions.RequestException as e:
-        logging.error(f'Request failed: {e}')
+
+    key = ('pending_tasks', get_org_name(), get_project_name(), due_before, due_after, tuple(PENDING_TASK_FIELDS))
+    return single_flight.do(key, fetch)
+
+def fetch_pending_tasks(due_date):
+    """
+    Fetch work items from Azure DevOps that are not marked as done and have a due date past the specified date.
+    
+    Args:
+        due_date (str): The date in YYYY-MM-DD format to filter tasks with due dates past this value.
+            Defaults to today if it is not a valid date.
+    
+    Returns:
+        dict or None: A dictionary of work items or None in case of failure.
+    """
+    due_date = _valid_date(due_date, datetime.today().strftime('%Y-%m-%d'))
+
+    all_work_items = _fetch_pending_work_items(due_after=due_date)
+    if all_work_items is None:
         return None
+    return {"workItems": all_work_items}
 
 def get_friday_dates():
     today = datetime.today()
@@ -89,140 +142,120 @@ def fetch_all_pending_tasks(due_date):
     Returns:
         list or None: A list of work items or None in case of failure.
     """
-    url = f'https://dev.azure.com/{get_org_name()}/{get_project_name()}/_apis/wit/wiql?api-version=7.1-preview.2'
-    auth = HTTPBasicAuth('', PAT)  # Empty username, PAT as the password
+    due_date = _valid_date(due_date, datetime.today().strftime('%Y-%m-%d'))
+    return _fetch_pending_work_items(due_before=due_date)
 
-    # Define the WIQL query
-    query = {
-        "query": f"""
-        SELECT [System.Id], [System.Title], [System.State], [System.AssignedTo], [Microsoft.VSTS.Scheduling.DueDate]
-        FROM WorkItems
-        WHERE [System.State] <> 'Done'
-        AND [Microsoft.VSTS.Scheduling.DueDate] <= '{due_date}'
-        ORDER BY [System.ChangedDate] DESC
-        """
-    }
+REPORT_FILE_NAME = 'work_items_due_dates.xlsx'
+REPORT_COLUMNS = ['ID', 'Title', 'State', 'Assigned To', 'Due Date', 'Created By', 'Priority', 'Severity']
+
+def _report_row(task):
+    fields = task['fields']
+    return [
+        task['id'],
+        fields.get('System.Title', ''),
+        fields.get('System.State', ''),
+        fields.get('System.AssignedTo', {}).get('displayName', ''),
+        fields.get('Microsoft.VSTS.Scheduling.DueDate', ''),
+        fields.get('System.CreatedBy', {}).get('displayName', ''),
+        fields.get('Microsoft.VSTS.Common.Priority', ''),
+        fields.get('Microsoft.VSTS.Common.Severity', ''),
+    ]
+
+def organize_tasks_by_due_date(output_path=REPORT_FILE_NAME):
+    """
+    Build the weekly status report workbook, with one sheet per Friday the pending tasks are due by.
+
+    Each sheet's due date window is filtered server side by its own WIQL query. All queries
+    and batch reads share one as-of timestamp, so the sheets show the same point in time.
+    Rows are written to the workbook as each batch of work items arrives, using xlsxwriter's
+    constant_memory mode, so memory use stays flat regardless of the backlog size.
+
+    Args:
+        output_path (str): Where to write the workbook.
+
+    Returns:
+        str or None: The workbook path, or None in case of failure.
+    """
+    this_friday, next_friday, friday_after_next = (friday.strftime('%Y-%m-%d') for friday in get_friday_dates())
+    # Every window is queried and read as of the same moment, so the sheets are consistent
+    as_of = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    windows = [
+        ('This Friday', None, this_friday),
+        ('Next Friday', this_friday, next_friday),
+        ('Friday After Next', next_friday, friday_after_next),
+    ]
 
     try:
-        # Send POST request to execute the WIQL query
-        response = requests.post(url, auth=auth, json=query)
-        logging.debug(f'WIQL Query URL: {url}')
-        logging.debug(f'WIQL Query Payload: {query}')
-        logging.debug(f'Response Status Code: {response.status_code}')
-        logging.debug(f'Response Content: {response.content.decode()}')
-        
-        if response.status_code == 200:
-            # Extract work item IDs from the response
-            work_item_refs = response.json().get('workItems', [])
-            work_item_ids = [item['id'] for item in work_item_refs]
-            logging.debug(f'Fetched Work Item IDs: {work_item_ids}')
-            
-            # Fetch full details for each work item in batches of 200
-            all_work_items = []
-            for i in range(0, len(work_item_ids), 200):
-                batch_ids = work_item_ids[i:i+200]
-                details_url = f"https://dev.azure.com/{get_org_name()}/{get_project_name()}/_apis/wit/workitemsbatch?api-version=7.1-preview.1"
-                details_payload = {"ids": batch_ids}
-                details_response = requests.post(details_url, auth=auth, json=details_payload)
-                logging.debug(f'Details URL: {details_url}')
-                logging.debug(f'Details Payload: {details_payload}')
-                logging.debug(f'Details Response Status Code: {details_response.status_code}')
-                logging.debug(f'Details Response Content: {details_response.content.decode()}')
-                
-                if details_response.status_code == 200:
-                    all_work_items.extend(details_response.json().get('value', []))
-                else:
-                    logging.error(f'Failed to fetch work item details: {details_response.status_code}')
-                    logging.error(f'Response Content: {details_response.content.decode()}')
-                    return None
-            
-            return all_work_items
-        else:
-            logging.error(f'Failed to execute WIQL query: {response.status_code}')
-            logging.error(f'Response Content: {response.content.decode()}')
-            return None
+        sheet_ids = []
+        for sheet_name, due_after, due_before in windows:
+            work_item_ids = _query_pending_task_ids(due_before=due_before, due_after=due_after, as_of=as_of)
+            if work_item_ids is None:
+                logging.error('Failed to fetch tasks')
+                return
+            sheet_ids.append((sheet_name, work_item_ids))
+
+        workbook = xlsxwriter.Workbook(output_path, {'constant_memory': True})
+        try:
+            # Define a format for the header cells
+            header_format = workbook.add_format({
+                'bold': True,
+                'text_wrap': True,
+                'valign': 'top',
+                'fg_color': '#7AC143',  # Change this to your desired color
+                'border': 1
+            })
+
+            for sheet_name, work_item_ids in sheet_ids:
+                worksheet = workbook.add_worksheet(sheet_name)
+                worksheet.write_row(0, 0, REPORT_COLUMNS, header_format)
+                row = 1
+                for page in iter_work_item_pages(work_item_ids, fields=PENDING_TASK_FIELDS, as_of=as_of):
+                    if page is None:
+                        logging.error('Failed to fetch tasks')
+                        return
+                    for task in page:
+                        worksheet.write_row(row, 0, _report_row(task))
+                        row += 1
+        finally:
+            workbook.close()
     except requests.exceptions.RequestException as e:
         logging.error(f'Request failed: {e}')
-        return None
-
-def organize_tasks_by_due_date():
-    this_friday, next_friday, friday_after_next = get_friday_dates()
-    
-    all_tasks = fetch_all_pending_tasks(friday_after_next.strftime('%Y-%m-%d'))
-    
-    if all_tasks is None:
-        logging.error('Failed to fetch tasks')
         return
-    
-    tasks_this_friday = []
-    tasks_next_friday = []
-    tasks_friday_after_next = []
-    
-    for task in all_tasks:
-        due_date = task['fields'].get('Microsoft.VSTS.Scheduling.DueDate')
-        if due_date:
-            try:
-                due_date = datetime.strptime(due_date, '%Y-%m-%dT%H:%M:%S.%fZ').date()
-            except ValueError:
-                due_date = datetime.strptime(due_date, '%Y-%m-%dT%H:%M:%SZ').date()
-            if due_date <= this_friday.date():
-                tasks_this_friday.append(task)
-            elif due_date <= next_friday.date():
-                tasks_next_friday.append(task)
-            else:
-                tasks_friday_after_next.append(task)
-    
-    def extract_relevant_fields(tasks):
-        extracted_tasks = []
-        for task in tasks:
-            fields = task['fields']
-            extracted_tasks.append({
-                'ID': task['id'],
-                'Title': fields.get('System.Title', ''),
-                'State': fields.get('System.State', ''),
-                'Assigned To': fields.get('System.AssignedTo', {}).get('displayName', ''),
-                'Due Date': fields.get('Microsoft.VSTS.Scheduling.DueDate', ''),
-                'Created By': fields.get('System.CreatedBy', {}).get('displayName', ''),
-                'Priority': fields.get('Microsoft.VSTS.Common.Priority', ''),
-                'Severity': fields.get('Microsoft.VSTS.Common.Severity', '')
-            })
-        return extracted_tasks
-    
-    tasks_this_friday = extract_relevant_fields(tasks_this_friday)
-    tasks_next_friday = extract_relevant_fields(tasks_next_friday)
-    tasks_friday_after_next = extract_relevant_fields(tasks_friday_after_next)
-    
-    # Create DataFrames for each set of tasks
-    df_this_friday = pd.DataFrame(tasks_this_friday)
-    df_next_friday = pd.DataFrame(tasks_next_friday)
-    df_friday_after_next = pd.DataFrame(tasks_friday_after_next)
-    
-    # Create an Excel writer object
-    with pd.ExcelWriter('work_items_due_dates.xlsx', engine='xlsxwriter') as writer:
-        df_this_friday.to_excel(writer, sheet_name='This Friday', index=False)
-        df_next_friday.to_excel(writer, sheet_name='Next Friday', index=False)
-        df_friday_after_next.to_excel(writer, sheet_name='Friday After Next', index=False)
-        
-        # Get the xlsxwriter workbook and worksheet objects
-        workbook  = writer.book
-        worksheet_this_friday = writer.sheets['This Friday']
-        worksheet_next_friday = writer.sheets['Next Friday']
-        worksheet_friday_after_next = writer.sheets['Friday After Next']
-        
-        # Define a format for the header cells
-        header_format = workbook.add_format({
-            'bold': True,
-            'text_wrap': True,
-            'valign': 'top',
-            'fg_color': '#7AC143',  # Change this to your desired color
-            'border': 1
-        })
-        
-        # Apply the format to the header cells
-        for col_num, value in enumerate(df_this_friday.columns.values):
-            worksheet_this_friday.write(0, col_num, value, header_format)
-        for col_num, value in enumerate(df_next_friday.columns.values):
-            worksheet_next_friday.write(0, col_num, value, header_format)
-        for col_num, value in enumerate(df_friday_after_next.columns.values):
-            worksheet_friday_after_next.write(0, col_num, value, header_format)
-    return "work_items_due_dates.xlsx"
+    return output_path
+
+def _build_status_report():
+    """
+    Build the status report into a private temporary file and return its contents.
+
+    Returns:
+        bytes or None: The workbook, or None in case of failure.
+    """
+    fd, path = tempfile.mkstemp(prefix='work_items_due_dates_', suffix='.xlsx')
+    os.close(fd)
+    try:
+        if organize_tasks_by_due_date(path) is None:
+            return None
+        with open(path, 'rb') as report_file:
+            return report_file.read()
+    finally:
+        os.remove(path)
+
+def generate_status_report():
+    """
+    Generate the status report workbook for the current project.
+
+    Every request builds into its own file, so concurrent users never overwrite each other.
+    Reports are cached by project, work item snapshot version and report week, so identical
+    reports are served from memory and concurrent requests for one report share a single build.
+
+    Returns:
+        bytes or None: The workbook, or None in case of failure.
+    """
+    version = get_work_item_snapshot_version()
+    if version is None:
+        logging.warning('Work item snapshot unavailable; building the status report without caching.')
+        return _build_status_report()
+
+    fridays = [friday.date() for friday in get_friday_dates()]
+    key = report_cache_key('status_report', get_org_name(), get_project_name(), version, fridays)
+    return report_cache.get_or_build(key, _build_status_report)
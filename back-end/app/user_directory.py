@@ -0,0 +1,183 @@
+import logging
+import threading
+import time
+import requests
+from app.config import get_org_name, get_azure_devops_graph_api_url, get_user_directory_ttl
+from app.async_service import devops_get_async
+from app.devops_client import devops_get
+from app.single_flight import single_flight
+
+CONTINUATION_HEADER = 'x-ms-continuationtoken'
+
+
+def clean_user_data(raw_data):
+    """
+    Clean and structure user data from the raw API response.
+    """
+    users = raw_data.get("value", [])
+    cleaned_users = []
+
+    for user in users:
+        cleaned_users.append({
+            "displayName": user.get("displayName", "N/A"),
+            "domain": user.get("domain", "N/A"),
+            "mailAddress": user.get("mailAddress", "N/A"),
+            "principalName": user.get("principalName", "N/A"),
+            "descriptor": user.get("descriptor"),
+        })
+    return cleaned_users
+
+
+class UserIndex:
+    """
+    Cleaned users of one organization, indexed by email, descriptor and display name.
+
+    Email and display name lookups ignore case. Display names are not unique in Azure DevOps;
+    the first user listed with a name wins.
+    """
+    def __init__(self, users):
+        self.users = users
+        self.by_email = {}
+        self.by_descriptor = {}
+        self.by_display_name = {}
+        for user in users:
+            email = user.get("mailAddress")
+            if email and email != "N/A":
+                self.by_email.setdefault(email.lower(), user)
+            if user.get("descriptor"):
+                self.by_descriptor.setdefault(user["descriptor"], user)
+            display_name = user.get("displayName")
+            if display_name and display_name != "N/A":
+                self.by_display_name.setdefault(display_name.lower(), user)
+
+    def as_response(self):
+        """The {"count", "users"} shape returned by get_all_users."""
+        return {"count": len(self.users), "users": self.users}
+
+
+class UserDirectory:
+    """
+    Process-wide cache of each organization's users from the Graph API.
+
+    The list is fetched page by page following the continuation token, so large organizations
+    are complete, and served from memory for USER_DIRECTORY_TTL seconds. Concurrent misses for
+    the same organization share one fetch. Failed fetches are not cached.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # org -> (expires_at, UserIndex)
+
+    def get(self):
+        """Return the UserIndex of the current organization, or None if it could not be fetched."""
+        org, url = get_org_name(), _users_url()
+        index = self._cached(org)
+        if index is None:
+            index = single_flight.do(('users', url), lambda: self._store(org, _fetch_users(url)))
+        return index
+
+    async def get_async(self):
+        """Async version of get, sharing in-flight fetches with it."""
+        org, url = get_org_name(), _users_url()
+        index = self._cached(org)
+        if index is None:
+            index = await single_flight.do_async(('users', url), lambda: self._fetch_and_store_async(org, url))
+        return index
+
+    def find_by_email(self, email):
+        index = self.get()
+        return index.by_email.get(email.lower()) if index and email else None
+
+    def find_by_descriptor(self, descriptor):
+        index = self.get()
+        return index.by_descriptor.get(descriptor) if index and descriptor else None
+
+    def find_by_display_name(self, display_name):
+        index = self.get()
+        return index.by_display_name.get(display_name.lower()) if index and display_name else None
+
+    def invalidate(self, org=None):
+        """Drop the cached users of one organization, or of every organization when org is None."""
+        with self._lock:
+            if org is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(org, None)
+        logging.debug(f'Invalidated user directory for org={org}')
+
+    def _cached(self, org):
+        with self._lock:
+            entry = self._entries.get(org)
+            if entry is None:
+                return None
+            expires_at, index = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[org]
+                return None
+            return index
+
+    def _store(self, org, users):
+        if users is None:
+            return None
+        index = UserIndex(users)
+        ttl = get_user_directory_ttl()
+        if ttl > 0:
+            with self._lock:
+                self._entries[org] = (time.monotonic() + ttl, index)
+        return index
+
+    async def _fetch_and_store_async(self, org, url):
+        return self._store(org, await _fetch_users_async(url))
+
+
+def _users_url():
+    return f'{get_azure_devops_graph_api_url()}/users?api-version=7.1-preview.1'
+
+
+def _page_url(url, continuation_token):
+    return f'{url}&continuationToken={requests.utils.quote(continuation_token)}' if continuation_token else url
+
+
+def _parse_users_page(response):
+    """Return (cleaned users, continuation token) of one page, or (None, None) if it failed."""
+    logging.debug(f'Response Status Code: {response.status_code}')
+    if response.status_code != 200:
+        logging.error(f'Failed to fetch data from Azure DevOps: {response.status_code}')
+        logging.error(f'Response Content: {response.content.decode()}')
+        return None, None
+    return clean_user_data(response.json()), response.headers.get(CONTINUATION_HEADER)
+
+
+def _fetch_users(url):
+    users, continuation_token, seen = [], None, set()
+    try:
+        while True:
+            page, continuation_token = _parse_users_page(devops_get(_page_url(url, continuation_token)))
+            if page is None:
+                return None
+            users.extend(page)
+            if not continuation_token or continuation_token in seen:
+                return users
+            seen.add(continuation_token)
+    except requests.exceptions.RequestException as e:
+        logging.error(f'Request failed: {e}')
+        return None
+
+
+async def _fetch_users_async(url):
+    users, continuation_token, seen = [], None, set()
+    try:
+        while True:
+            page, continuation_token = _parse_users_page(await devops_get_async(_page_url(url, continuation_token)))
+            if page is None:
+                return None
+            users.extend(page)
+            if not continuation_token or continuation_token in seen:
+                return users
+            seen.add(continuation_token)
+    except requests.exceptions.RequestException as e:
+        logging.error(f'Request failed: {e}')
+        return None
+
+
+# Shared instance used by get_all_users and the user lookups
+user_directory = UserDirectory()
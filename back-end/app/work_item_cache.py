@@ -0,0 +1,52 @@
+import threading
+import time
+import logging
+from app.config import get_work_item_cache_ttl
+
+
+class SnapshotCache:
+    """
+    Process-wide cache of work item snapshots, keyed per organization and project.
+
+    Entries expire after the configured TTL (WORK_ITEM_CACHE_TTL) and can be dropped
+    explicitly whenever a write makes the cached data stale.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # (org, project, kind) -> (expires_at, value)
+
+    def get(self, org, project, kind):
+        """Return the cached value for the given key, or None if missing or expired."""
+        key = (org, project, kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, org, project, kind, value):
+        """Store a value for the given key. Nothing is stored when the TTL is 0."""
+        ttl = get_work_item_cache_ttl()
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[(org, project, kind)] = (time.monotonic() + ttl, value)
+
+    def invalidate(self, org=None, project=None):
+        """
+        Drop cached entries. With no arguments the whole cache is cleared,
+        otherwise only the entries matching the given organization and/or project.
+        """
+        with self._lock:
+            for key in list(self._entries):
+                if (org is None or key[0] == org) and (project is None or key[1] == project):
+                    del self._entries[key]
+        logging.debug(f'Invalidated work item cache for org={org}, project={project}')
+
+
+# Shared instance used by all work item fetchers
+work_item_cache = SnapshotCache()
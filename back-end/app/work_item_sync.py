@@ -0,0 +1,179 @@
+import threading
+import time
+import logging
+import requests
+from app.config import get_work_item_full_sync_interval
+from app.devops_client import devops_post
+from app.async_service import run_async, fetch_work_items_batch_async
+from app.single_flight import single_flight
+
+
+class WorkItemStore:
+    """
+    Local copy of one project's work items, kept current with System.ChangedDate watermarks.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.items = {}  # work item id -> cleaned work item
+        self.changed_dates = {}  # work item id -> System.ChangedDate
+        self.watermark = None  # Latest System.ChangedDate merged into the store
+        self.last_full_sync = None  # time.monotonic() of the last full sync
+        self.version = 0  # Bumped whenever a sync changes the store contents
+
+    def needs_full_sync(self):
+        """A full sync is due on first use and periodically, so deleted or moved items drop out."""
+        if self.watermark is None or self.last_full_sync is None:
+            return True
+        return time.monotonic() - self.last_full_sync >= get_work_item_full_sync_interval()
+
+    def snapshot(self):
+        """Return the stored work items ordered by System.ChangedDate, newest first."""
+        ordered_ids = sorted(self.items, key=lambda item_id: self.changed_dates.get(item_id, ""), reverse=True)
+        return [self.items[item_id] for item_id in ordered_ids]
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(org, project):
+    """Return the work item store for the given organization and project, creating it if needed."""
+    with _stores_lock:
+        store = _stores.get((org, project))
+        if store is None:
+            store = WorkItemStore()
+            _stores[(org, project)] = store
+        return store
+
+
+# Fields read by clean_work_item, plus the ChangedDate used for the sync watermark
+WORK_ITEM_SYNC_FIELDS = [
+    "System.Id",
+    "System.Title",
+    "System.State",
+    "System.AssignedTo",
+    "System.TeamProject",
+    "System.ChangedDate",
+    "Microsoft.VSTS.Common.Priority",
+    "Microsoft.VSTS.Common.Severity",
+    "Microsoft.VSTS.Scheduling.DueDate",
+]
+
+
+def clean_work_item(item):
+    """
+    Reduce a raw work item from the workitemsbatch API to the fields used across the app.
+    """
+    fields = item.get("fields", {})
+    return {
+        "id": item.get("id"),
+        "title": fields.get("System.Title", ""),
+        "state": fields.get("System.State", ""),
+        "assigned_to": fields.get("System.AssignedTo", {}).get("displayName", ""),
+        "team_project": fields.get("System.TeamProject", ""),
+        "priority": fields.get("Microsoft.VSTS.Common.Priority", ""),
+        "severity": fields.get("Microsoft.VSTS.Common.Severity", ""),
+        "due_date": fields.get("Microsoft.VSTS.Scheduling.DueDate", "")
+    }
+
+
+def _fetch_changed_work_items(org, project, changed_since=None):
+    """
+    Fetch raw work items of a project, optionally only those changed at or after a watermark.
+
+    Args:
+        org (str): Azure DevOps organization name.
+        project (str): Azure DevOps project name.
+        changed_since (str): System.ChangedDate watermark, or None to fetch everything.
+
+    Returns:
+        list or None: Raw work items, or None in case of failure.
+    """
+    # timePrecision makes WIQL compare ChangedDate to the millisecond instead of by day
+    url = f'https://dev.azure.com/{org}/{project}/_apis/wit/wiql?timePrecision=true&api-version=7.1-preview.2'
+
+    changed_filter = f"AND [System.ChangedDate] >= '{changed_since}'" if changed_since else ""
+    query = {
+        "query": f"""
+        SELECT [System.Id], [System.ChangedDate]
+        FROM WorkItems
+        WHERE [System.TeamProject] = '{project}' {changed_filter}
+        ORDER BY [System.ChangedDate] DESC
+        """
+    }
+
+    try:
+        response = devops_post(url, json=query)
+        logging.debug(f'WIQL Query Payload: {query}')
+        logging.debug(f'Response Status Code: {response.status_code}')
+        if response.status_code != 200:
+            logging.error(f'Failed to execute WIQL query: {response.status_code}')
+            logging.error(f'Response Content: {response.content.decode()}')
+            return None
+
+        work_item_ids = [item['id'] for item in response.json().get('workItems', [])]
+        logging.debug(f'Fetched {len(work_item_ids)} changed work item IDs for {project}')
+
+        # Pages are fetched as concurrent tasks on the async service loop
+        return run_async(fetch_work_items_batch_async(
+            work_item_ids, base_url=f'https://dev.azure.com/{org}/{project}/_apis', fields=WORK_ITEM_SYNC_FIELDS))
+    except requests.exceptions.RequestException as e:
+        logging.error(f'Request failed: {e}')
+        return None
+
+
+def sync_work_items(org, project):
+    """
+    Bring the local store of a project up to date and return its work items.
+
+    Only work items changed since the stored watermark are fetched; a full sync runs
+    on first use and every WORK_ITEM_FULL_SYNC_INTERVAL seconds to drop deleted items.
+    Concurrent callers for the same project share one sync instead of queueing for the
+    store lock and syncing again one after another.
+
+    Returns:
+        list or None: Cleaned work items ordered by System.ChangedDate (newest first),
+        or None if the sync failed.
+    """
+    return single_flight.do(
+        ('sync_work_items', org, project, tuple(WORK_ITEM_SYNC_FIELDS)), lambda: _sync_work_items(org, project))
+
+
+def _sync_work_items(org, project):
+    store = get_store(org, project)
+    with store.lock:
+        full_sync = store.needs_full_sync()
+        started = time.monotonic()
+        raw_items = _fetch_changed_work_items(org, project, None if full_sync else store.watermark)
+        if raw_items is None:
+            return None
+
+        if full_sync:
+            fetched_ids = {item.get("id") for item in raw_items}
+            removed_ids = set(store.items) - fetched_ids
+            for item_id in removed_ids:
+                del store.items[item_id]
+                store.changed_dates.pop(item_id, None)
+            changed = bool(removed_ids)
+            store.last_full_sync = started
+        else:
+            changed = False
+
+        for item in raw_items:
+            item_id = item.get("id")
+            changed_date = item.get("fields", {}).get("System.ChangedDate", "")
+            cleaned = clean_work_item(item)
+            if store.changed_dates.get(item_id) != changed_date or store.items.get(item_id) != cleaned:
+                store.items[item_id] = cleaned
+                store.changed_dates[item_id] = changed_date
+                changed = True
+            if changed_date and (store.watermark is None or changed_date > store.watermark):
+                store.watermark = changed_date
+
+        if changed:
+            store.version += 1
+        logging.debug(
+            f'{"Full" if full_sync else "Incremental"} sync of {project}: {len(raw_items)} fetched, '
+            f'{len(store.items)} stored, version {store.version}'
+        )
+        return store.snapshot()
@@ -1,7 +1,71 @@
 import json
+from app.config import get_chat_context_token_budget, get_chat_tool_result_token_limit
+from helper.chatgpt import count_tokens
+
+
+def _message_tokens(message):
+    """Approximate tokens a message takes in a request, including its tool calls."""
+    content = message.get("content")
+    if content is not None and not isinstance(content, str):
+        content = json.dumps(content, default=str)
+    tokens = 4 + count_tokens(content or "")  # About 4 tokens of per-message overhead
+    if message.get("tool_calls"):
+        tokens += count_tokens(json.dumps(message["tool_calls"], default=str))
+    return tokens
+
+
+def _truncate_text(text, token_limit):
+    """Cut a text down to about token_limit tokens, noting how much was dropped."""
+    tokens = count_tokens(text)
+    if tokens <= token_limit:
+        return text
+    return text[:token_limit * 4] + f" ... [truncated, about {tokens - token_limit} more tokens omitted]"
+
+
+def _truncate_tool_message(message, token_limit):
+    content = message.get("content")
+    if content is not None and not isinstance(content, str):
+        content = json.dumps(content, default=str)
+    return dict(message, content=_truncate_text(content or "", token_limit))
+
+
+def _omitted_turns_note(dropped_turns, token_limit):
+    """System message standing in for dropped turns, recalling what the user asked in them."""
+    questions = [
+        message["content"] for turn in dropped_turns for message, _ in turn
+        if message.get("role") == "user" and isinstance(message.get("content"), str)
+    ]
+    return {
+        "role": "system",
+        "content": _truncate_text(
+            f"Earlier turns were omitted to fit the context window; in them the user asked: {' | '.join(questions)}",
+            token_limit),
+    }
+
+
+def _pair_tool_messages(messages):
+    """
+    Copy of the messages where every tool call has its tool result and every tool result
+    follows the assistant message that called it, as the chat completions API requires.
+    """
+    answered = {message.get("tool_call_id") for message in messages if message.get("role") == "tool"}
+    paired, declared = [], set()
+    for message in messages:
+        if message.get("tool_calls"):
+            tool_calls = [tool_call for tool_call in message["tool_calls"] if tool_call.get("id") in answered]
+            if not tool_calls:
+                continue
+            declared.update(tool_call["id"] for tool_call in tool_calls)
+            message = dict(message, tool_calls=tool_calls)
+        elif message.get("role") == "tool" and message.get("tool_call_id") not in declared:
+            continue
+        paired.append(message)
+    return paired
+
+
 class ChatData:
-    def __init__(self):
-        self.messages = []  # Stores the conversation history
+    def __init__(self, messages=None):
+        self.messages = list(messages) if messages else []  # Stores the conversation history
 
     def add_system_message(self, content):
         """Add a system message."""
@@ -20,20 +84,22 @@ class ChatData:
         self.messages.append(message)
 
     def add_assistant_tool_call(self, toolscall):
-        """Add a function call to the assistant's response."""
+        """Add the function calls of the assistant's response, all of them in order."""
         if toolscall and isinstance(toolscall, list):
-            tool_call = toolscall[0]
-            function_call = {
-                "id": tool_call.id,
-                "function": {
-                    "name": tool_call.function.name,
-                    "arguments": tool_call.function.arguments
-                },
-                "type": tool_call.type,
-            }
+            function_calls = [
+                {
+                    "id": tool_call.id,
+                    "function": {
+                        "name": tool_call.function.name,
+                        "arguments": tool_call.function.arguments
+                    },
+                    "type": tool_call.type,
+                }
+                for tool_call in toolscall
+            ]
             self.messages.append({
                 "role": "assistant",
-                "tool_calls": [function_call]
+                "tool_calls": function_calls
             })
 
     def add_tool_message(self, tool_call_id, content):
@@ -52,6 +118,62 @@ class ChatData:
         """Retrieve the current conversation history."""
         return self.messages
 
+    def get_context_messages(self, token_budget=None):
+        """
+        Retrieve the conversation history to send to the model, compacted to fit a token budget.
+
+        The stored history is left intact. Over the budget (CHAT_CONTEXT_TOKEN_BUDGET by default),
+        tool results are truncated to CHAT_TOOL_RESULT_TOKEN_LIMIT, those of earlier turns first, oldest
+        first, then those of the latest turn. Only if that is not enough are the oldest turns dropped,
+        as few as needed, and replaced by a note of what the user asked in them. The leading system prompt and the latest turn are always kept, and turns are
+        dropped whole, so tool calls and their results stay paired.
+        """
+        budget = token_budget or get_chat_context_token_budget()
+        limit = get_chat_tool_result_token_limit()
+        messages = _pair_tool_messages(self.messages)
+        tokens = [_message_tokens(message) for message in messages]
+        total = sum(tokens)
+        if total <= budget:
+            return messages
+
+        # Split off the leading system messages; the rest is grouped into turns starting at each user message
+        head_size = 0
+        while head_size < len(messages) and messages[head_size].get("role") == "system":
+            head_size += 1
+        head = messages[:head_size]
+        turns = []
+        for message, message_tokens in zip(messages[head_size:], tokens[head_size:]):
+            if message.get("role") == "user" or not turns:
+                turns.append([])
+            turns[-1].append([message, message_tokens])
+
+        def truncate_tool_results(turn):
+            nonlocal total
+            for entry in turn:
+                if total <= budget:
+                    return
+                if entry[0].get("role") == "tool" and entry[1] > limit:
+                    entry[0] = _truncate_tool_message(entry[0], limit)
+                    truncated_tokens = _message_tokens(entry[0])
+                    total += truncated_tokens - entry[1]
+                    entry[1] = truncated_tokens
+
+        # Size every turn after truncation, the latest one included, before dropping any whole turn
+        for turn in turns:
+            truncate_tool_results(turn)
+
+        dropped, note_tokens = [], 0
+        while total + note_tokens > budget and len(turns) > 1:
+            turn = turns.pop(0)
+            dropped.append(turn)
+            total -= sum(message_tokens for _, message_tokens in turn)
+            note_tokens = _message_tokens(_omitted_turns_note(dropped, limit))
+
+        if dropped:
+            head = head + [_omitted_turns_note(dropped, limit)]
+
+        return head + [message for turn in turns for message, _ in turn]
+
     def reset(self):
         """Keep the first message and delete everything else."""
         if self.messages:
@@ -1,5 +1,8 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 from chatbot.chatbot_functions import (
     send_email_outlook,
     fetch_emails_outlook,
@@ -10,19 +13,38 @@ from chatbot.chatbot_functions import (
     get_total_priority_by_user_devops,
     update_work_item_assigned
 )
-from helper.chatgpt import send_chat_with_functions
+from helper.chatgpt import send_chat_with_functions_async, stream_chat_with_functions
+from app.async_service import run_async
+from app.config import get_chat_max_tool_rounds, get_chat_turn_time_budget, get_chat_tool_workers
 from chatbot.chat_data_struc import ChatData
+from chatbot.tool_cache import tool_cache
+
+_tool_executor = None
+_tool_executor_lock = threading.Lock()
+
+
+def get_tool_executor():
+    """Return the process-wide executor that runs chatbot tool calls, shared by every session."""
+    global _tool_executor
+    with _tool_executor_lock:
+        if _tool_executor is None:
+            _tool_executor = ThreadPoolExecutor(max_workers=get_chat_tool_workers(), thread_name_prefix='chat-tool')
+        return _tool_executor
 
 
 class ChatHandler:
-    def __init__(self):
-        self.chat_data = ChatData()
-        self.chat_data.add_system_message(
-            content="You are an intelligent assistant designed to support a project manager who utilizes Azure DevOps and Outlook. "
-                    "You have access to tools that allow you to send emails, retrieve emails, schedule meetings, fetch work items, "
-                    "retrieve risk items, list users, and calculate priority scores. Use these capabilities to provide comprehensive assistance "
-                    "and streamline the project management process."
-        )
+    def __init__(self, messages=None):
+        """
+        :param messages: Conversation history to resume, e.g. a persisted chat session; starts a new conversation if empty.
+        """
+        self.chat_data = ChatData(messages)
+        if not messages:
+            self.chat_data.add_system_message(
+                content="You are an intelligent assistant designed to support a project manager who utilizes Azure DevOps and Outlook. "
+                        "You have access to tools that allow you to send emails, retrieve emails, schedule meetings, fetch work items, "
+                        "retrieve risk items, list users, and calculate priority scores. Use these capabilities to provide comprehensive assistance "
+                        "and streamline the project management process."
+            )
 
         # Define tools as required by the new format
         self.tools = [
@@ -174,96 +196,124 @@ class ChatHandler:
 
     def handle_message(self, user_message, model="gpt-4o-mini-2024-07-18"):
         """Handle user input, call tools if needed, and return a response."""
-        self.chat_data.add_user_message(user_message)
-
-        # Send chat with tools
-        messages = self.chat_data.get_messages()
-        response = send_chat_with_functions(messages, model=model, functions=self.tools)
-
-        # Process tool calls
-        if response.tool_calls:
-            self.chat_data.add_assistant_tool_call(toolscall=response.tool_calls)
-            return self._handle_tool_calls(response.tool_calls)
-
-        # Handle regular assistant responses
-        assistant_message = response.content
-        self.chat_data.add_assistant_message(content=assistant_message)
+        for _ in self._run_turn(user_message, model, stream=False):
+            pass
         return {"messages": self.chat_data.get_messages()}
-    
-    def _handle_tool_calls(self, tool_calls):
-        """Handle multiple tool calls in parallel and return the results."""
-        results = []
-        
-        # Debug: Log the total number of tool calls to process
-        print(f"Processing {len(tool_calls)} tool calls...")
 
-        # Process tool calls in parallel
-        with ThreadPoolExecutor() as executor:
-            future_to_tool_call = {
-                executor.submit(self._execute_tool_call, tool_call): tool_call for tool_call in tool_calls
-            }
-            print(f"Submitted {len(future_to_tool_call)} tool calls for execution.")
+    def stream_message(self, user_message, model="gpt-4o-mini-2024-07-18"):
+        """
+        Handle user input like handle_message, yielding events as the reply is produced:
+        {"type": "token", "content"} for each piece of the reply, {"type": "tool_start", "id", "name"}
+        and {"type": "tool_end", "id", "name", "ok", "status"} around each tool call, where status is
+        "finished", "failed", "running" (still running at the deadline) or "skipped" (never started), and finally
+        {"type": "done", "content"} with the complete reply.
+        """
+        yield from self._run_turn(user_message, model, stream=True)
 
-            for future in as_completed(future_to_tool_call):
-                tool_call = future_to_tool_call[future]
-                try:
-                    # Get the result of the tool call execution
-                    result = future.result()
-                    
-                    # Debug: Log the result of the tool call
-                    print(f"Tool call {tool_call.id} executed successfully. Result: {result}")
+    def _run_turn(self, user_message, model, stream):
+        """
+        Agent loop of one user turn: the model may call tools over several rounds, e.g. fetch the
+        risk items and then email their owners, until it answers without calling tools.
 
-                    # Check if the result is None or unexpected
-                    if result is None:
-                        print(f"Warning: Tool call {tool_call.id} returned None.")
-                    
-                    results.append({
-                        "tool_call_id": tool_call.id,
-                        "content": result,
-                    })
-                except Exception as e:
-                    # Handle any exceptions and log errors
-                    error_message = f"Error executing tool call {tool_call.id}: {str(e)}"
-                    print(error_message)  # Debug: Log the error
-                    results.append({
-                        "tool_call_id": tool_call.id,
-                        "content": json.dumps({"error": error_message}),  # Ensure content is JSON-formatted
-                    })
+        Every tool call of a round runs concurrently. After CHAT_MAX_TOOL_ROUNDS rounds, or once
+        CHAT_TURN_TIME_BUDGET seconds have passed, the model is asked to answer without tools; tool
+        calls requested after the deadline are not run.
+        Yields the events documented in stream_message.
+        """
+        self.chat_data.add_user_message(user_message)
+        deadline = time.monotonic() + get_chat_turn_time_budget()
+        max_rounds = max(get_chat_max_tool_rounds(), 0)
 
-        # Debug: Log the total results processed
-        print(f"Processed {len(results)} tool call results.")
+        step = 0
+        while True:
+            final = step >= max_rounds or time.monotonic() >= deadline
+            functions = None if final else self.tools
+            messages = self.chat_data.get_context_messages()
+            if stream:
+                response = yield from self._stream_completion(messages, model, functions)
+            else:
+                response = run_async(send_chat_with_functions_async(messages, model=model, functions=functions))
 
-        # Append each tool response immediately after its corresponding tool call
-        for result in results:
-            # Debug: Log each result before appending
-            print(f"Appending result for tool call {result['tool_call_id']}: {result['content']}")
+            if final or not response.tool_calls:
+                break
+            if time.monotonic() >= deadline:
+                # The model call itself used up the budget; answer without running the tools it asked for
+                logging.warning(f"Turn time budget spent before round {step + 1}; skipping {len(response.tool_calls)} tool calls")
+                step = max_rounds
+                continue
+            logging.debug(f"Round {step + 1}: processing {len(response.tool_calls)} tool calls...")
+            self.chat_data.add_assistant_tool_call(toolscall=response.tool_calls)
+            yield from self._run_tool_calls(response.tool_calls, deadline)
+            step += 1
 
-            # Create the tool response message
-            tool_response_message = {
-                "role": "tool",
-                "content": result["content"],
-                "tool_call_id": result["tool_call_id"]
-            }
+        self.chat_data.add_assistant_message(content=response.content)
+        yield {"type": "done", "content": response.content}
 
-            # Add the tool response message immediately after its tool call
-            self.chat_data.add_tool_message(tool_response_message["tool_call_id"], tool_response_message["content"])
+    def _stream_completion(self, messages, model, functions=None):
+        """Forward the tokens of a streamed completion as events and return the assembled message."""
+        message = None
+        for kind, value in stream_chat_with_functions(messages, model=model, functions=functions):
+            if kind == "token":
+                yield {"type": "token", "content": value}
+            else:
+                message = value
+        return message
 
-        # Debug: Log the updated conversation history before sending to the model
-        print("Updated conversation history:")
-        _messages = self.chat_data.get_messages()
-        for message in _messages:
-            print(message)
+    def _run_tool_calls(self, tool_calls, deadline):
+        """
+        Run a round of tool calls concurrently on the shared tool executor and record their results
+        in call order, yielding an event as each one starts and finishes. Every tool call keeps a result:
+        calls that never started by the deadline are cancelled, and calls still running are left to
+        finish in the background and reported as such, so the model does not repeat their side effects.
+        """
+        executor = get_tool_executor()
+        futures = {}
+        for tool_call in tool_calls:
+            yield {"type": "tool_start", "id": tool_call.id, "name": tool_call.function.name}
+            futures[executor.submit(self._execute_tool_call, tool_call)] = tool_call
 
-        # Send the updated conversation history back to the model for continuation
-        response = send_chat_with_functions(messages=_messages, model="gpt-4o-mini-2024-07-18")
+        results = {}
+        try:
+            for future in as_completed(futures, timeout=max(deadline - time.monotonic(), 0)):
+                tool_call = futures[future]
+                result = future.result()  # _execute_tool_call handles its own errors
+                if result is None:
+                    result = json.dumps({"error": f"Tool call {tool_call.id} ({tool_call.function.name}) failed."})
+                    status = "failed"
+                else:
+                    status = "finished"
+                results[tool_call.id] = result
+                yield self._tool_end_event(tool_call, status)
+        except FuturesTimeoutError:
+            for future, tool_call in futures.items():
+                if tool_call.id in results:
+                    continue
+                name = tool_call.function.name
+                if future.cancel():
+                    logging.warning(f"Tool call {tool_call.id} ({name}) was not started within the time budget.")
+                    results[tool_call.id] = json.dumps({
+                        "status": "skipped",
+                        "message": f"{name} was not run because the time budget ran out; it had no effect.",
+                    })
+                    status = "skipped"
+                else:
+                    logging.warning(f"Tool call {tool_call.id} ({name}) is still running past the time budget.")
+                    results[tool_call.id] = json.dumps({
+                        "status": "running",
+                        "message": f"{name} is still running and will complete in the background; "
+                                   "its result is not available yet. Do not call it again.",
+                    })
+                    status = "running"
+                yield self._tool_end_event(tool_call, status)
 
-        # Debug: Log the response from the model
-        print("Model response received:")
-        print(response.content)
-        self.chat_data.add_assistant_message(content=response.content)
-        # Return the updated messages from the response
-        return {"messages": self.chat_data.get_messages()}
+        # Tool results follow their tool calls in call order
+        for tool_call in tool_calls:
+            self.chat_data.add_tool_message(tool_call.id, results[tool_call.id])
 
+    @staticmethod
+    def _tool_end_event(tool_call, status):
+        return {"type": "tool_end", "id": tool_call.id, "name": tool_call.function.name,
+                "ok": status == "finished", "status": status}
 
     def _execute_tool_call(self, tool_call):
         try:
@@ -280,8 +330,8 @@ class ChatHandler:
             if not function:
                 raise ValueError(f"Function '{function_name}' not found in function mapping.")
 
-            # Call the function with the parsed arguments
-            result = function(**arguments)  # Pass arguments as keyword arguments
+            # Call the function with the parsed arguments, reusing a recent result of the same call
+            result = tool_cache.call(function_name, arguments, function)
             print(f"Result for tool call {tool_call.id}: {result}")
             return result
 
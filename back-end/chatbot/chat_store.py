@@ -0,0 +1,151 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from app.config import get_chat_max_sessions, get_chat_session_idle_timeout, get_chat_session_db_path
+from app.sqlite_file import SQLiteFile
+from chatbot.chat_handler import ChatHandler
+
+
+class ChatSession:
+    """One user's conversation: its handler and the lock serializing messages within it."""
+    def __init__(self, handler):
+        self.lock = threading.Lock()
+        self.handler = handler
+        self.last_used = time.monotonic()
+
+
+class ChatSessionStore:
+    """
+    Session-keyed chat conversations with bounded memory.
+
+    At most CHAT_MAX_SESSIONS sessions are kept in memory, in LRU order; sessions idle for
+    CHAT_SESSION_IDLE_TIMEOUT seconds expire. Each session has its own lock, so different
+    users chat concurrently while messages within one conversation are handled in order.
+
+    If CHAT_SESSION_DB_PATH is set, conversations are also persisted to that SQLite file,
+    so sessions evicted from memory or lost on restart are resumed from disk until they expire.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # session id -> ChatSession, least recently used first
+        self._db = SQLiteFile(get_chat_session_db_path, [
+            'CREATE TABLE IF NOT EXISTS chat_sessions '
+            '(session_id TEXT PRIMARY KEY, messages TEXT NOT NULL, updated_at REAL NOT NULL)',
+            'CREATE INDEX IF NOT EXISTS chat_sessions_updated_at ON chat_sessions (updated_at)',
+        ])
+
+    @contextmanager
+    def session(self, session_id):
+        """
+        Hold a session's lock and yield its ChatHandler; the conversation is persisted on a clean exit.
+
+        Args:
+            session_id (str): Id chosen by the client; unknown ids start a new conversation.
+
+        Yields:
+            ChatHandler: The handler owning the session's conversation.
+        """
+        chat_session = self._get_or_create(session_id)
+        with chat_session.lock:
+            try:
+                yield chat_session.handler
+            finally:
+                chat_session.last_used = time.monotonic()
+            self._save(session_id, chat_session.handler.chat_data.get_messages())
+
+    def history(self, session_id):
+        """
+        Messages of a session, from memory or disk, without creating or touching the session.
+
+        Returns:
+            list: The conversation so far; empty for unknown or expired sessions.
+        """
+        with self._lock:
+            chat_session = self._sessions.get(session_id)
+        if chat_session is not None:
+            with chat_session.lock:
+                return list(chat_session.handler.chat_data.get_messages())
+        return self._load(session_id) or []
+
+    def reset(self, session_id):
+        """Keep the system prompt of a session and delete everything else; unknown sessions are left uncreated."""
+        with self._lock:
+            known = session_id in self._sessions
+        if not known and self._load(session_id) is None:
+            return
+        with self.session(session_id) as handler:
+            handler.chat_data.reset()
+
+    def _get_or_create(self, session_id):
+        with self._lock:
+            self._evict_locked()
+            chat_session = self._sessions.get(session_id)
+            if chat_session is not None:
+                self._sessions.move_to_end(session_id)
+                return chat_session
+
+        # Read the persisted conversation without holding the store lock, so other sessions are not kept waiting on disk I/O
+        loaded = ChatSession(ChatHandler(self._load(session_id)))
+
+        with self._lock:
+            chat_session = self._sessions.get(session_id)
+            if chat_session is not None:
+                # Another request loaded the same session meanwhile; use the one already in the store
+                self._sessions.move_to_end(session_id)
+                return chat_session
+            chat_session = loaded
+            self._sessions[session_id] = chat_session
+            while len(self._sessions) > max(get_chat_max_sessions(), 1):
+                evicted_id, _ = self._sessions.popitem(last=False)
+                logging.debug(f'Evicted least recently used chat session {evicted_id}')
+            return chat_session
+
+    def _evict_locked(self):
+        """Drop sessions idle past the timeout; they sit at the least recently used end."""
+        idle_timeout = get_chat_session_idle_timeout()
+        if idle_timeout <= 0:
+            return
+        now = time.monotonic()
+        while self._sessions:
+            session_id, chat_session = next(iter(self._sessions.items()))
+            if now - chat_session.last_used < idle_timeout:
+                break
+            del self._sessions[session_id]
+            logging.debug(f'Expired idle chat session {session_id}')
+
+    def _load(self, session_id):
+        """Return the persisted messages of a session that has not expired, or None."""
+        try:
+            with self._db.connect() as connection:
+                if connection is None:
+                    return None
+                idle_timeout = get_chat_session_idle_timeout()
+                if idle_timeout > 0:
+                    # Expired conversations are purged whenever a session is (re)loaded
+                    connection.execute('DELETE FROM chat_sessions WHERE updated_at < ?', (time.time() - idle_timeout,))
+                row = connection.execute(
+                    'SELECT messages FROM chat_sessions WHERE session_id = ?', (session_id,)).fetchone()
+                return json.loads(row[0]) if row else None
+        except (sqlite3.Error, ValueError) as e:
+            logging.error(f'Failed to load chat session {session_id}: {e}')
+            return None
+
+    def _save(self, session_id, messages):
+        try:
+            with self._db.connect() as connection:
+                if connection is None:
+                    return
+                connection.execute(
+                    'INSERT OR REPLACE INTO chat_sessions (session_id, messages, updated_at) VALUES (?, ?, ?)',
+                    (session_id, json.dumps(messages, default=str), time.time()),
+                )
+        except sqlite3.Error as e:
+            logging.error(f'Failed to persist chat session {session_id}: {e}')
+
+
+# Shared instance used by the chatbot routes
+chat_store = ChatSessionStore()
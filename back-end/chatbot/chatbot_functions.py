@@ -1,4 +1,4 @@
-from app.automated_task_assignment import get_all_users, calculate_priority_score, validate_and_parse_json, get_work_item_counts_for_all_users, update_work_item_assigned_to
+from app.automated_task_assignment import get_all_users, calculate_priority_scores, validate_and_parse_json, get_work_item_counts_for_all_users, update_work_item_assigned_to
 from app.config import AZURE_DEVOPS_REST_API_URL, PAT, PROJECT_NAME, ORG_NAME, jwt_token
 from helper.outlook import OutlookEmailSender
 from app.project_plan import fetch_all_work_items
@@ -86,11 +86,13 @@ def get_total_priority_by_user_devops():
         tasks = []
 
     tasks = [validate_and_parse_json(task) for task in tasks]
+    users = all_users.get("users", []) if isinstance(all_users, dict) else []
 
-    user_priority = {user: 0 for user in all_users}
-    for task in tasks:
-        user = task.get("assignedTo")
+    # Work items carry the assignee's display name
+    user_priority = {user.get("displayName"): 0 for user in users}
+    for task, score in zip(tasks, calculate_priority_scores(tasks)):
+        user = task.get("assigned_to")
         if user in user_priority:
-            user_priority[user] += calculate_priority_score(task)
+            user_priority[user] += score
 
     return user_priority
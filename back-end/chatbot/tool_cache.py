@@ -0,0 +1,87 @@
+import json
+import logging
+import threading
+import time
+from app.config import get_org_name, get_project_name
+
+# Seconds a read-only tool's result is reused; tools not listed (Outlook, writes) are never cached
+TOOL_CACHE_TTLS = {
+    "get_work_items": 60,
+    "get_priority_scores": 120,
+    "get_risk_items": 300,  # Includes a GPT call
+    "get_users": 600,
+}
+
+# Tools that change data, and the cached tools whose results they make stale.
+# Every cached tool reads assignments (get_users includes per-user task counts), so a reassignment drops them all.
+TOOL_INVALIDATES = {
+    "update_work_item_assignment": ["get_work_items", "get_priority_scores", "get_risk_items", "get_users"],
+}
+
+
+def canonical_arguments(arguments):
+    """Arguments as a stable string, so equal calls share a cache entry whatever the key order."""
+    return json.dumps(arguments or {}, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class ToolResultCache:
+    """
+    Memoizes chatbot tool calls by tool name and canonical arguments, per organization and project.
+
+    Results are shared across chat sessions for TOOL_CACHE_TTLS seconds. Calling a tool listed in
+    TOOL_INVALIDATES drops the cached results it makes stale in the same project. Failed calls
+    (exceptions or None) are not cached.
+    """
+    def __init__(self, ttls=None, invalidates=None):
+        self._lock = threading.Lock()
+        self._entries = {}  # (org, project, tool name, arguments) -> (expires_at, result)
+        self._ttls = TOOL_CACHE_TTLS if ttls is None else ttls
+        self._invalidates = TOOL_INVALIDATES if invalidates is None else invalidates
+
+    def call(self, tool_name, arguments, function):
+        """
+        Return the cached result of a tool call, or call function(**arguments) and cache its result.
+
+        Args:
+            tool_name (str): Name the model used for the tool.
+            arguments (dict): Parsed tool call arguments.
+            function (callable): Implementation of the tool.
+        """
+        ttl = self._ttls.get(tool_name, 0)
+        key = (get_org_name(), get_project_name(), tool_name, canonical_arguments(arguments))
+        if ttl > 0:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and time.monotonic() < entry[0]:
+                    logging.debug(f'Serving tool {tool_name} from cache')
+                    return entry[1]
+
+        result = function(**(arguments or {}))
+
+        stale = self._invalidates.get(tool_name)
+        if stale:
+            self.invalidate(stale)
+        if ttl > 0 and result is not None:
+            now = time.monotonic()
+            with self._lock:
+                # Drop expired entries so calls with ever-changing arguments do not pile up
+                for expired_key in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+                    del self._entries[expired_key]
+                self._entries[key] = (now + ttl, result)
+        return result
+
+    def invalidate(self, tool_names=None):
+        """
+        Drop the current organization and project's cached results of the given tools,
+        or of every tool when tool_names is None; other projects keep their results.
+        """
+        org, project = get_org_name(), get_project_name()
+        with self._lock:
+            for key in list(self._entries):
+                if key[0] == org and key[1] == project and (tool_names is None or key[2] in tool_names):
+                    del self._entries[key]
+        logging.debug(f'Invalidated tool results for {tool_names or "all tools"} in {org}/{project}')
+
+
+# Shared instance used by every chat session
+tool_cache = ToolResultCache()
@@ -1,6 +1,18 @@
 import os
-from openai import OpenAI
+import asyncio
+import logging
+from functools import lru_cache
+from types import SimpleNamespace
+from openai import OpenAI, AsyncOpenAI
 import json
+from helper.llm_cache import llm_cache, llm_cache_key
+from app.async_service import run_async, gather_bounded
+from app.config import get_openai_concurrency
+
+try:
+    import tiktoken
+except ImportError:  # Optional; token counts fall back to an estimate
+    tiktoken = None
 from flask import Flask, jsonify, request
 
 # Initialize OpenAI client
@@ -12,28 +24,72 @@ client = OpenAI(
     api_key='REMOVED_OPENAI_KEY'
 )
 
-# Function to send a chat with given prompt and context
-def send_chat(prompt, context, model="gpt-4o-mini", schema=""):
-    """
-    Sends a chat message to OpenAI GPT-4 model.
-    :param prompt: The user's message.
-    :param context: Additional context for the conversation.
-    :param model: The model to use for chat completion (default is "gpt-4o-mini").
-    :param schema: Optional schema for the response format.
-    :return: GPT response as a string or a JSON object, based on the schema.
-    """
+# Same credentials for the async service layer; only used on its event loop
+async_client = AsyncOpenAI(api_key=client.api_key)
+
+def _build_chat_request(prompt, context, schema):
+    """Build the messages and response format shared by send_chat and send_chat_async."""
     messages = [
         {"role": "system", "content": "You are a helpful assistant."},
         {"role": "user", "content": prompt},
     ]
     if context:
         messages.insert(1, {"role": "system", "content": context})
-    
+
     # Define response format based on whether a schema is provided
     if not schema:
         response_format = {"type": "text"}
     else:
         response_format = {"type": "json_schema", "json_schema": schema}
+    return messages, response_format
+
+@lru_cache(maxsize=None)
+def _get_encoding(model):
+    """Tokenizer of a model, or None if tiktoken is missing or cannot load it (e.g. offline)."""
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:  # Unknown model name, use the GPT-4o tokenizer
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logging.warning(f"Falling back to estimated token counts: {e}")
+        return None
+
+def count_tokens(text, model="gpt-4o-mini"):
+    """
+    Counts the tokens of a text for a model.
+    Uses tiktoken when it is installed, otherwise estimates about 4 characters per token.
+    :param text: Text to count.
+    :param model: Model whose tokenizer applies.
+    :return: Token count.
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+# Function to send a chat with given prompt and context
+def send_chat(prompt, context, model="gpt-4o-mini", schema="", use_cache=True):
+    """
+    Sends a chat message to OpenAI GPT-4 model.
+    Identical requests (model, messages and response format) are answered from the LLM response cache.
+    :param prompt: The user's message.
+    :param context: Additional context for the conversation.
+    :param model: The model to use for chat completion (default is "gpt-4o-mini").
+    :param schema: Optional schema for the response format.
+    :param use_cache: Set to False to always ask the model, e.g. when a fresh answer is wanted.
+    :return: GPT response as a string or a JSON object, based on the schema.
+    """
+    messages, response_format = _build_chat_request(prompt, context, schema)
+    cache_key = llm_cache_key(model, messages, response_format) if use_cache else None
+    if cache_key:
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
     try:
         chat_completion = client.chat.completions.create(
@@ -49,6 +105,8 @@ def send_chat(prompt, context, model="gpt-4o-mini", schema=""):
     else:
         # Access the message content safely
         content = chat_completion.choices[0].message.content
+        if cache_key:
+            llm_cache.set(cache_key, content)
         return content
 
 
@@ -90,6 +148,118 @@ def send_chat_with_functions(messages, model="gpt-4o-2024-08-06", functions=None
 
 
 
+def stream_chat_with_functions(messages, model="gpt-4o-2024-08-06", functions=None):
+    """
+    Streams a chat completion, optionally with specific functions.
+    :param messages: List of conversation history.
+    :param model: The model to use for chat completion.
+    :param functions: List of functions available for the model to call.
+    :return: Generator of ("token", text) for each piece of the reply as it arrives, then one
+             ("message", message) with the assembled reply, whose content and tool_calls match
+             the message returned by send_chat_with_functions.
+    """
+    params = {"model": model, "messages": messages, "stream": True}
+    # Pass the tools parameter only if it has a value other than None
+    if functions:
+        params["tools"] = functions
+
+    content_parts = []
+    tool_calls = {}  # Index in the reply -> accumulated id, name and arguments
+    try:
+        stream = client.chat.completions.create(**params)
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                content_parts.append(delta.content)
+                yield "token", delta.content
+            # Tool calls arrive in fragments keyed by their index
+            for tool_call_delta in delta.tool_calls or []:
+                tool_call = tool_calls.setdefault(tool_call_delta.index, {"id": None, "name": "", "arguments": ""})
+                if tool_call_delta.id:
+                    tool_call["id"] = tool_call_delta.id
+                if tool_call_delta.function:
+                    tool_call["name"] += tool_call_delta.function.name or ""
+                    tool_call["arguments"] += tool_call_delta.function.arguments or ""
+    except Exception as e:
+        raise RuntimeError(f"Error during chat completion: {str(e)}")
+
+    yield "message", SimpleNamespace(
+        content="".join(content_parts) or None,
+        tool_calls=[
+            SimpleNamespace(
+                id=tool_call["id"],
+                type="function",
+                function=SimpleNamespace(name=tool_call["name"], arguments=tool_call["arguments"] or "{}"),
+            )
+            for _, tool_call in sorted(tool_calls.items())
+        ] or None,
+    )
+
+
+async def send_chat_async(prompt, context, model="gpt-4o-mini", schema="", use_cache=True):
+    """
+    Async version of send_chat, for use on the async service loop; shares its LLM response cache.
+    :param prompt: The user's message.
+    :param context: Additional context for the conversation.
+    :param model: The model to use for chat completion (default is "gpt-4o-mini").
+    :param schema: Optional schema for the response format.
+    :param use_cache: Set to False to always ask the model.
+    :return: GPT response content as a string.
+    """
+    messages, response_format = _build_chat_request(prompt, context, schema)
+    cache_key = llm_cache_key(model, messages, response_format) if use_cache else None
+    if cache_key:
+        # The disk tier may be consulted, so keep it off the event loop
+        cached = await asyncio.to_thread(llm_cache.get, cache_key)
+        if cached is not None:
+            return cached
+
+    try:
+        chat_completion = await async_client.chat.completions.create(
+            messages=messages,
+            model=model,
+            response_format=response_format
+        )
+    except Exception as e:
+        raise RuntimeError(f"Error during chat completion: {str(e)}")
+
+    content = chat_completion.choices[0].message.content
+    if cache_key:
+        await asyncio.to_thread(llm_cache.set, cache_key, content)
+    return content
+
+
+async def send_chat_with_functions_async(messages, model="gpt-4o-2024-08-06", functions=None):
+    """
+    Async version of send_chat_with_functions, for use on the async service loop.
+    :param messages: List of conversation history.
+    :param model: The model to use for chat completion.
+    :param functions: List of functions available for the model to call.
+    :return: GPT response message.
+    """
+    try:
+        # Pass the tools parameter only if it has a value other than None
+        if functions:
+            chat_completion = await async_client.chat.completions.create(
+                model=model,
+                messages=messages,
+                tools=functions
+            )
+        else:
+            chat_completion = await async_client.chat.completions.create(
+                model=model,
+                messages=messages
+            )
+    except Exception as e:
+        raise RuntimeError(f"Error during chat completion: {str(e)}")
+
+    if not chat_completion.choices[0].message:
+        raise RuntimeError(f"Error during chat completion: {str(chat_completion)}")
+    return chat_completion.choices[0].message
+
+
 # Function to generate an email using GPT
 def generate_gpt_email(to, to_name, from_, from_name, context):
     """
@@ -115,3 +285,75 @@ def generate_subject_line(body):
 
 
 
+
+# Structured output of generate_gpt_email_with_subject
+EMAIL_SCHEMA = {
+    "name": "email_draft",
+    "schema": {
+        "type": "object",
+        "properties": {
+            "subject": {
+                "type": "string",
+                "description": "Concise and professional subject line, without a 'Subject:' prefix"
+            },
+            "body": {
+                "type": "string",
+                "description": "The email body, without the subject"
+            }
+        },
+        "required": [
+            "subject",
+            "body"
+        ],
+        "additionalProperties": False
+    },
+    "strict": True
+}
+
+def _email_prompt(to_name, from_name, context):
+    return (
+        f"Generate a professional email to {to_name} from {from_name}. Context: {context}. "
+        f"Return the email body and a concise, professional subject line for it. "
+        f"DO NOT INCLUDE THE SUBJECT INSIDE THE EMAIL BODY."
+    )
+
+# Function to generate an email and its subject line in one GPT call
+def generate_gpt_email_with_subject(to, to_name, from_, from_name, context):
+    """
+    Generates an email body and subject line with one structured-output call, instead of
+    generate_gpt_email followed by generate_subject_line.
+    :param to: The recipient of the email.
+    :param from_: The sender of the email.
+    :param context: Context or key details for the email content.
+    :return: Dictionary with 'subject' and 'body'.
+    """
+    return json.loads(send_chat(_email_prompt(to_name or to, from_name or from_, context), None, schema=EMAIL_SCHEMA))
+
+async def generate_gpt_email_with_subject_async(to, to_name, from_, from_name, context):
+    """
+    Async version of generate_gpt_email_with_subject, for use on the async service loop.
+    """
+    content = await send_chat_async(_email_prompt(to_name or to, from_name or from_, context), None, schema=EMAIL_SCHEMA)
+    return json.loads(content)
+
+# Function to draft personalized emails for many recipients at once
+def generate_gpt_emails(recipients, from_, from_name, context):
+    """
+    Drafts a personalized email for each recipient, with up to OPENAI_CONCURRENCY calls in flight at once.
+    :param recipients: List of dictionaries with 'to', optional 'to_name' and optional per-recipient 'context'
+                       that is added to the shared context.
+    :param from_: The sender of the emails.
+    :param context: Context shared by all emails.
+    :return: List in recipient order of {'to', 'to_name', 'subject', 'body'}, or {'to', 'to_name', 'error'}
+             for a recipient whose draft failed.
+    """
+    async def draft(recipient):
+        to, to_name = recipient.get("to"), recipient.get("to_name")
+        recipient_context = f"{context} {recipient['context']}" if recipient.get("context") else context
+        try:
+            email = await generate_gpt_email_with_subject_async(to, to_name, from_, from_name, recipient_context)
+            return {"to": to, "to_name": to_name, "subject": email.get("subject", ""), "body": email.get("body", "")}
+        except (RuntimeError, ValueError) as e:
+            return {"to": to, "to_name": to_name, "error": str(e)}
+
+    return run_async(gather_bounded([draft(recipient) for recipient in recipients], get_openai_concurrency()))
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from app.config import get_llm_cache_max_bytes, get_llm_cache_db_path, get_llm_cache_db_max_bytes
+from app.sqlite_file import SQLiteFile
+
+
+def llm_cache_key(model, messages, response_format):
+    """Hash of everything a chat completion depends on; the schema is part of response_format."""
+    payload = {"model": model, "messages": messages, "response_format": response_format}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Content-addressed cache of chat completion responses.
+
+    Responses are kept in memory in LRU order up to LLM_CACHE_MAX_BYTES. If LLM_CACHE_DB_PATH
+    is set they are also stored in that SQLite file, which survives restarts and is trimmed to
+    LLM_CACHE_DB_MAX_BYTES, least recently used first. Disk hits are promoted back into memory.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._responses = OrderedDict()  # key -> response text
+        self._size = 0  # Bytes of response text held in memory
+        self._db = SQLiteFile(get_llm_cache_db_path, [
+            'CREATE TABLE IF NOT EXISTS llm_responses '
+            '(key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)',
+        ])
+
+    def get(self, key):
+        """Return the cached response for key, or None."""
+        with self._lock:
+            if key in self._responses:
+                self._responses.move_to_end(key)
+                return self._responses[key]
+
+        response = self._load(key)
+        if response is not None:
+            self._remember(key, response)
+        return response
+
+    def set(self, key, response):
+        """Cache a response in memory and, if enabled, on disk."""
+        if not isinstance(response, str):
+            return
+        self._remember(key, response)
+        self._save(key, response)
+
+    def _remember(self, key, response):
+        max_bytes = get_llm_cache_max_bytes()
+        size = len(response.encode())
+        if size > max_bytes:
+            return
+        with self._lock:
+            previous = self._responses.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous.encode())
+            self._responses[key] = response
+            self._size += size
+            while self._size > max_bytes:
+                _, evicted = self._responses.popitem(last=False)
+                self._size -= len(evicted.encode())
+
+    def _load(self, key):
+        try:
+            with self._db.connect() as connection:
+                if connection is None:
+                    return None
+                row = connection.execute('SELECT response FROM llm_responses WHERE key = ?', (key,)).fetchone()
+                if row is None:
+                    return None
+                connection.execute('UPDATE llm_responses SET last_used = ? WHERE key = ?', (time.time(), key))
+                return row[0]
+        except sqlite3.Error as e:
+            logging.error(f'Failed to read the LLM response cache: {e}')
+            return None
+
+    def _save(self, key, response):
+        try:
+            with self._db.connect() as connection:
+                if connection is None:
+                    return
+                connection.execute(
+                    'INSERT OR REPLACE INTO llm_responses (key, response, size, last_used) VALUES (?, ?, ?, ?)',
+                    (key, response, len(response.encode()), time.time()),
+                )
+                # Keep the most recently used responses that fit the size limit
+                connection.execute(
+                    'DELETE FROM llm_responses WHERE key IN ('
+                    'SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY last_used DESC) AS running FROM llm_responses) '
+                    'WHERE running > ?)',
+                    (get_llm_cache_db_max_bytes(),),
+                )
+        except sqlite3.Error as e:
+            logging.error(f'Failed to write the LLM response cache: {e}')
+
+
+# Shared instance used by send_chat and send_chat_async
+llm_cache = LLMResponseCache()
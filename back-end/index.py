@@ -1,21 +1,26 @@
-from flask import Flask, jsonify, request, send_file
-from app.automated_task_assignment import get_all_users, fetch_unassigned_tasks, get_work_item_counts_for_all_users, generate_gpt_task_assignment, update_work_item_assigned_to
+from flask import Flask, Response, jsonify, request, send_file
+from app.automated_task_assignment import get_all_users, fetch_unassigned_tasks, get_work_item_counts_for_all_users, generate_gpt_task_assignment, generate_gpt_task_assignments, generate_local_task_assignments, update_work_item_assigned_to, bulk_update_assigned_to
 from app.status_report import fetch_pending_tasks
 from flask_cors import CORS
-from app.stats import count_work_items_by_state, count_work_items_by_assignment, count_work_items_by_type
+from app.stats import count_work_items_by_state, count_work_items_by_assignment, count_work_items_by_type, summarize_work_items
 from app.project_plan import fetch_all_work_items,generate_ms_project_plan
 from app.config import jwt_token, set_jwt_token, set_project_name, get_project_name, get_jwt_token
 from app.risk import filter_risk_items
 from helper.outlook import OutlookEmailSender
-from app.status_report import organize_tasks_by_due_date
-from helper.chatgpt import generate_gpt_email,generate_subject_line
+from app.status_report import generate_status_report, REPORT_FILE_NAME
+from helper.chatgpt import generate_gpt_email_with_subject, generate_gpt_emails
 from app.login import get_current_project, fetch_user_projects
+from app.work_item_cache import work_item_cache
 import os
-from chatbot.chat_handler import ChatHandler
+import json
+import math
+import uuid
+from io import BytesIO
+from chatbot.chat_store import chat_store
+from chatbot.tool_cache import tool_cache, TOOL_INVALIDATES
 
 app = Flask(__name__)
 CORS(app)
-chat_handler = ChatHandler()
 
 def update_project_name(new_project_name):
     # Open the .env file to read lines
@@ -75,6 +80,8 @@ def update_work_item(work_item_id, user_email):
 
     result = update_work_item_assigned_to(work_item_id, user_email)
     if result:
+        # Chatbot tool results built on the old assignment are stale now
+        tool_cache.invalidate(TOOL_INVALIDATES["update_work_item_assignment"])
         return jsonify(result)
     else:
         return jsonify({'error': 'Failed to update work item'}), 500
@@ -104,6 +111,25 @@ def fetch_pending_tasks_route(due_date):
     else:
         return jsonify({'error': 'Failed to fetch pending tasks'}), 500
 
+@app.route('/api/stats/summary', methods=['GET'])
+def stats_summary_route():
+    """
+    Flask route to count work items along several dimensions from a single fetch.
+    Dimensions are passed as ?group_by=state,type,assignment,assignee,area_path,iteration (default: all).
+    """
+    group_by = request.args.get('group_by')
+    dimensions = [dimension.strip() for dimension in group_by.split(',') if dimension.strip()] if group_by else None
+
+    try:
+        summary = summarize_work_items(dimensions)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if summary is not None:
+        return jsonify(summary)
+    else:
+        return jsonify({'error': 'Failed to summarize work items'}), 500
+
 @app.route('/api/stats/count_work_items_by_state', methods=['GET'])
 def count_work_items_by_state_route():
 
@@ -148,22 +174,17 @@ def receive_token():
 
 @app.route('/api/automated_task_assignment/bulk_update', methods=['POST'])
 def bulk_update():
-    data = request.json  # Expecting a list of { taskId: email } pairs
-    results = []
-    
-    for task in data:
-        task_id = task.get('taskId')
-        email = task.get('email')
-        
-        result = update_work_item_assigned_to(task_id, email)
-        
-        #success = True  # Assume success for demonstration
-
-        if result:
-            results.append({task_id: "Assigned"})
-        else:
-            results.append({task_id: "Failed"})
-    
+    data = request.json  # Expecting a list of { taskId, email, optional rev } objects
+    if not isinstance(data, list):
+        return jsonify({"error": "Expected a list of { taskId, email } objects"}), 400
+
+    details = bulk_update_assigned_to(data)
+    results = [{item["id"]: item["status"]} for item in details]
+
+    # Chatbot tool results built on the old assignments are stale now
+    tool_cache.invalidate(TOOL_INVALIDATES["update_work_item_assignment"])
+    if request.args.get('details', 'false').lower() == 'true':
+        return jsonify({"results": results, "details": details}), 200
     return jsonify(results), 200
 
 @app.route('/api/status_report/generate_gpt_task_assignment', methods=['POST'])
@@ -181,12 +202,25 @@ def generate_gpt_task_assignment_route_all():
     if isinstance(task_ids, str):
         task_ids = [task_ids]
 
+    # 'batch' (default) assigns all tasks in as few model calls as possible, 'single' calls the model per task
+    mode = data.get('mode', 'batch')
+    # 'gpt' (default) asks the model, 'local' uses the deterministic load-balancing solver
+    strategy = data.get('strategy', 'gpt')
+
     try:
-        assignments = []
-        for task_id in task_ids:
-            task_assignment = generate_gpt_task_assignment(task_id, fetch_all_work_items())
-            assignments.append({task_id: task_assignment})
-        
+        all_tasks = fetch_all_work_items()
+        if strategy == 'local':
+            local_assignments = generate_local_task_assignments(task_ids, all_tasks)
+            assignments = [{task_id: local_assignments[task_id]} for task_id in task_ids]
+        elif mode == 'single':
+            assignments = []
+            for task_id in task_ids:
+                task_assignment = generate_gpt_task_assignment(task_id, all_tasks)
+                assignments.append({task_id: task_assignment})
+        else:
+            batch_assignments = generate_gpt_task_assignments(task_ids, all_tasks, pre_rank=bool(data.get('pre_rank')))
+            assignments = [{task_id: batch_assignments[task_id]} for task_id in task_ids]
+
         return jsonify(assignments)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -195,12 +229,33 @@ def generate_gpt_task_assignment_route_all():
 def fetch_filter_risks():
     """
     Flask route to filter risk items.
+
+    Optional query parameters:
+        raw=true: return the partitioned risk list without the GPT formatting call.
+        due_window_days, score_percentile, exclude_states (comma-separated): override the default risk rules.
     """
-    risk_items = filter_risk_items()
-    if risk_items:
+    rules = {}
+    invalid_rules = {'error': 'due_window_days must be a non-negative number and score_percentile a number between 0 and 100'}
+    try:
+        if request.args.get('due_window_days'):
+            rules['due_window_days'] = float(request.args['due_window_days'])
+        if request.args.get('score_percentile'):
+            rules['score_percentile'] = float(request.args['score_percentile'])
+    except ValueError:
+        return jsonify(invalid_rules), 400
+    if not (math.isfinite(rules.get('due_window_days', 0)) and rules.get('due_window_days', 0) >= 0):
+        return jsonify(invalid_rules), 400
+    if not 0 <= rules.get('score_percentile', 0) <= 100:  # NaN fails the comparison too
+        return jsonify(invalid_rules), 400
+    if request.args.get('exclude_states'):
+        rules['exclude_states'] = [state.strip() for state in request.args['exclude_states'].split(',') if state.strip()]
+
+    use_gpt = request.args.get('raw', 'false').lower() != 'true'
+    risk_items = filter_risk_items(rules, use_gpt=use_gpt)
+    if risk_items or (not use_gpt and risk_items is not None):
         return jsonify(risk_items)
     else:
-         jsonify({'error': 'Failed to filter risk items'}), 500       
+        return jsonify({'error': 'Failed to filter risk items'}), 500
 
 @app.route('/api/email_sender/create_draft', methods=['POST'])
 def create_draft():
@@ -249,9 +304,39 @@ def generate_email_ai():
         return jsonify({'error': 'Missing to, from, or context parameter'}), 400
 
     try:
-        email = generate_gpt_email(to, to_name, from_, from_name, context)
-        subject = generate_subject_line(context)
-        return jsonify({'email': email, 'subject': subject})
+        # Body and subject come from one structured-output call
+        email = generate_gpt_email_with_subject(to, to_name, from_, from_name, context)
+        return jsonify({'email': email['body'], 'subject': email['subject']})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/email_sender/generate_emails_ai', methods=['POST'])
+def generate_emails_ai():
+    """
+    API Endpoint to draft personalized emails for many recipients concurrently using GPT-4.
+    Body: {"from", "from_name", "context", "recipients": [{"to", "to_name", "context"}]}
+    Returns {"emails": [{"to", "to_name", "email", "subject"} or {"to", "to_name", "error"}]} in recipient order.
+    """
+    data = request.get_json() or {}
+    from_ = data.get('from')
+    from_name = data.get('from_name')
+    context = data.get('context')
+    recipients = data.get('recipients')
+
+    if not from_ or not context or not isinstance(recipients, list) or not recipients:
+        return jsonify({'error': 'Missing from, context, or recipients parameter'}), 400
+    if any(not isinstance(recipient, dict) or not recipient.get('to') for recipient in recipients):
+        return jsonify({'error': 'Every recipient needs a to address'}), 400
+
+    try:
+        drafts = generate_gpt_emails(recipients, from_, from_name, context)
+        # Same field names as generate_email_ai
+        emails = [
+            draft if 'error' in draft else
+            {'to': draft['to'], 'to_name': draft['to_name'], 'email': draft['body'], 'subject': draft['subject']}
+            for draft in drafts
+        ]
+        return jsonify({'emails': emails})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -260,13 +345,10 @@ def generate_status_report_plan_route():
     """
     Flask route to generate a status report plan and return the file.
     """
-    status_report_plan = organize_tasks_by_due_date()
-    if status_report_plan:
-        file_path = status_report_plan
-        if file_path and os.path.exists(file_path):
-            return send_file(file_path, as_attachment=True)
-        else:
-            return jsonify({'error': 'File path is invalid or file does not exist'}), 500
+    report = generate_status_report()
+    if report:
+        return send_file(BytesIO(report), as_attachment=True, download_name=REPORT_FILE_NAME,
+                         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
     else:
         return jsonify({'error': 'Failed to generate status report plan'}), 500
 
@@ -319,6 +401,8 @@ def switch_project():
     if new_project_name:
         # Update the .env file with the new project name
         set_project_name(new_project_name)
+        # Drop any snapshot of the target project taken before the switch
+        work_item_cache.invalidate(project=new_project_name)
         #print(f"Switched to project: {new_project_name}")
         print(f"Switched to project: {get_project_name()}")
         return jsonify({'message': f'Switched to project: {new_project_name}'}), 200
@@ -326,39 +410,89 @@ def switch_project():
         return jsonify({'error': 'Invalid project name provided'}), 400
 
 
+def get_chat_session_id(data=None, create=True):
+    """
+    Chat session id of the request, from the JSON body, the query string or the X-Chat-Session-Id header.
+    When the client has none yet, a new id is generated if create is True (routes return it so the client
+    can reuse it), otherwise None is returned.
+    """
+    session_id = (data or {}).get('session_id') or request.args.get('session_id') or request.headers.get('X-Chat-Session-Id')
+    if not isinstance(session_id, str) or not session_id.strip():
+        return str(uuid.uuid4()) if create else None
+    return session_id.strip()[:128]
+
+
 @app.route('/api/chatbot/send_message', methods=['POST'])
 def send_message_to_chatbot():
     """
     Route to send a message to the chatbot and receive its response.
+    Body: {"message": str, "session_id": optional str}
     """
-    data = request.get_json()
+    data = request.get_json() or {}
     user_message = data.get('message')
+    session_id = get_chat_session_id(data)
 
     if not user_message:
         return jsonify({'error': 'Message content is required'}), 400
 
     try:
-        response = chat_handler.handle_message(user_message)
-        
-        # Filter out responses without content or with role 'tool'
-        filtered_response = [
-            msg for msg in response['messages']
-            if msg.get('content') and msg.get('role') != 'tool' and msg.get('role') != 'system'
-        ]
+        with chat_store.session(session_id) as chat_handler:
+            response = chat_handler.handle_message(user_message)
 
-        return jsonify({'messages': filtered_response})
+            # Filter out responses without content or with role 'tool'
+            filtered_response = [
+                msg for msg in response['messages']
+                if msg.get('content') and msg.get('role') != 'tool' and msg.get('role') != 'system'
+            ]
+
+        return jsonify({'messages': filtered_response, 'session_id': session_id})
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': str(e), 'session_id': session_id}), 500
+
+
+@app.route('/api/chatbot/stream_message', methods=['POST'])
+def stream_message_to_chatbot():
+    """
+    Route to send a message to the chatbot and stream its response as Server-Sent Events.
+    Body: {"message": str, "session_id": optional str}
+    Each event is a JSON object: {"type": "session", "session_id"} first, then "token",
+    "tool_start", "tool_end" and finally "done" (see ChatHandler.stream_message) or "error".
+    """
+    data = request.get_json() or {}
+    user_message = data.get('message')
+    session_id = get_chat_session_id(data)
+
+    if not user_message:
+        return jsonify({'error': 'Message content is required'}), 400
+
+    def format_event(event):
+        return f"data: {json.dumps(event)}\n\n"
+
+    def events():
+        yield format_event({'type': 'session', 'session_id': session_id})
+        try:
+            with chat_store.session(session_id) as chat_handler:
+                for event in chat_handler.stream_message(user_message):
+                    yield format_event(event)
+        except Exception as e:
+            yield format_event({'type': 'error', 'error': str(e)})
+
+    # Disable caching and proxy buffering so every event reaches the browser right away
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 @app.route('/api/chatbot/chat_history', methods=['GET'])
 def get_chat_history():
     """
-    Route to retrieve the chat history.
+    Route to retrieve the chat history of a session (?session_id=).
+    Reading never creates a session; unknown or expired sessions have an empty history.
     """
+    session_id = get_chat_session_id(create=False)
+    if session_id is None:
+        return jsonify({'error': 'session_id is required'}), 400
     try:
-        chat_history = chat_handler.get_chat_history()
-        return jsonify({'chat_history': chat_history})
+        return jsonify({'chat_history': chat_store.history(session_id), 'session_id': session_id})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -366,18 +500,24 @@ def get_chat_history():
 @app.route('/api/chatbot/reset_chat', methods=['POST'])
 def reset_chat_history():
     """
-    Route to reset the chat history.
+    Route to reset the chat history of a session.
+    Body: {"session_id": str}
     """
+    session_id = get_chat_session_id(request.get_json(silent=True), create=False)
+    if session_id is None:
+        return jsonify({'error': 'session_id is required'}), 400
     try:
-        chat_handler.chat_data.reset()
-        return jsonify({'message': 'Chat history reset successfully'})
+        chat_store.reset(session_id)
+        return jsonify({'message': 'Chat history reset successfully', 'session_id': session_id})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/download-report')
 def download_report():
-    file_path = r'C:\Users\ppatel08\ITCaseComp\FGF-ItCaseComp\Back End\work_items_due_dates.xlsx'  # Path to your file
-    return send_file(file_path, as_attachment=True)
+    """
+    Download the current status report; served from the report cache when nothing changed.
+    """
+    return generate_status_report_plan_route()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,81 @@
+import asyncio
+import app.automated_task_assignment as assignment
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self._body = body
+        self.text = str(body)
+
+    def json(self):
+        return self._body
+
+
+class FakeWorkItem:
+    """One work item with its revision history, answering the PATCH and GET calls of the bulk update."""
+    def __init__(self, assignee):
+        self.revisions = [assignee]  # Assignee at revision 1, 2, ...
+
+    @property
+    def rev(self):
+        return len(self.revisions)
+
+    def _body(self, rev):
+        return {"rev": rev, "fields": {"System.AssignedTo": {"uniqueName": self.revisions[rev - 1]}}}
+
+    async def patch(self, url, headers=None, json=None):
+        test = next((op for op in json if op["op"] == "test"), None)
+        if test is not None and test["value"] != self.rev:
+            return FakeResponse(412, {"message": "rev mismatch"})
+        self.revisions.append(json[-1]["value"])
+        return FakeResponse(200, {"rev": self.rev})
+
+    async def get(self, url, **kwargs):
+        if '/revisions/' in url:
+            return FakeResponse(200, self._body(int(url.split('/revisions/')[1].split('?')[0])))
+        return FakeResponse(200, self._body(self.rev))
+
+
+def _install(monkeypatch, work_item):
+    monkeypatch.setattr(assignment, 'devops_patch_async', work_item.patch)
+    monkeypatch.setattr(assignment, 'devops_get_async', work_item.get)
+
+
+def _update(rev):
+    return asyncio.run(assignment._update_assigned_to_async('https://example/_apis', 1, 'new@example.com', rev))
+
+
+def test_concurrent_reassignment_is_preserved(monkeypatch):
+    work_item = FakeWorkItem('old@example.com')
+    work_item.revisions.append('other@example.com')  # Someone else reassigned it after the caller read rev 1
+    _install(monkeypatch, work_item)
+
+    result = _update(rev=1)
+
+    assert result["status"] == "Conflict"
+    assert work_item.revisions[-1] == 'other@example.com'
+    assert result["attempts"] == 1
+
+
+def test_unrelated_change_is_retried_on_fresh_revision(monkeypatch):
+    work_item = FakeWorkItem('old@example.com')
+    work_item.revisions.append('old@example.com')  # Another field changed; the assignee did not
+    _install(monkeypatch, work_item)
+
+    result = _update(rev=1)
+
+    assert result["status"] == "Assigned"
+    assert work_item.revisions[-1] == 'new@example.com'
+    assert result["attempts"] == 2
+
+
+def test_already_assigned_counts_as_assigned(monkeypatch):
+    work_item = FakeWorkItem('old@example.com')
+    work_item.revisions.append('new@example.com')
+    _install(monkeypatch, work_item)
+
+    result = _update(rev=1)
+
+    assert result["status"] == "Assigned"
+    assert work_item.rev == 2
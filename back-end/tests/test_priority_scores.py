@@ -0,0 +1,20 @@
+from datetime import datetime, timedelta, timezone
+from app.automated_task_assignment import calculate_priority_score, calculate_priority_scores
+
+DUE_DATE = (datetime.now(timezone.utc) + timedelta(days=10, hours=12)).isoformat()
+
+
+def _tasks(priorities):
+    return [{"id": i, "priority": priority, "severity": "2 - High", "due_date": DUE_DATE}
+            for i, priority in enumerate(priorities)]
+
+
+def test_mixed_type_priorities_match_scalar_scores():
+    # 2 and 2.0, 1 and True hash equal; each must still be validated on its own
+    for priorities in ([2.0, 2], [2, 2.0], [True, 1], [1, True], ["3", 3, 3.0, None]):
+        tasks = _tasks(priorities)
+        assert calculate_priority_scores(tasks) == [calculate_priority_score(task) for task in tasks]
+
+
+def test_missing_due_dates_are_scored():
+    assert len(calculate_priority_scores([{"id": 1}, {"id": 2, "due_date": None}])) == 2
@@ -1,48 +1,90 @@
 "use client";
-import React, { useState } from "react";
+import React, { useEffect, useState } from "react";
 import DOMPurify from "dompurify"; // Import DOMPurify to sanitize bot responses.
 import ReactMarkdown from 'react-markdown';
+const SESSION_STORAGE_KEY = "chatbotSessionId"; // Keeps this browser's conversation across reloads
+
 const ChatBotPage: React.FC = () => {
     const [messages, setMessages] = useState<{ user: string; bot: string }[]>([]);
     const [userInput, setUserInput] = useState("");
     const [loading, setLoading] = useState(false); // State to manage loading animation
+    const [sessionId, setSessionId] = useState<string | null>(null);
+    const [toolStatus, setToolStatus] = useState<string | null>(null); // Progress of the tools the bot is running
+
+    useEffect(() => {
+        setSessionId(localStorage.getItem(SESSION_STORAGE_KEY));
+    }, []);
+
+    // The server assigns a session id on the first message; remember it for the next ones
+    const rememberSessionId = (id?: string) => {
+        if (id && id !== sessionId) {
+            setSessionId(id);
+            localStorage.setItem(SESSION_STORAGE_KEY, id);
+        }
+    };
 
     const handleSendMessage = async () => {
         if (userInput.trim() === "") return;
 
-        const newMessage = { user: userInput, bot: "" };
-        setMessages([...messages, newMessage]);
+        const prompt = userInput;
+        const history = [...messages];
+        let botMessage = "";
+        setMessages([...history, { user: prompt, bot: "" }]);
+        setUserInput("");
         setLoading(true); // Start loading animation
 
         try {
             const response = await fetch(
-                "http://127.0.0.1:5000/api/chatbot/send_message",
+                "http://127.0.0.1:5000/api/chatbot/stream_message",
                 {
                     method: "POST",
                     headers: {
                         "Content-Type": "application/json",
                     },
-                    body: JSON.stringify({ message: userInput }),
+                    body: JSON.stringify({ message: prompt, session_id: sessionId }),
                 }
             );
+            if (!response.ok || !response.body) {
+                throw new Error(`Chatbot request failed: ${response.status}`);
+            }
 
-            const data = await response.json();
-
-            // Extract the last assistant message
-            const botMessage =
-                data.messages
-                    ?.reverse()
-                    .find((msg: { role: string }) => msg.role === "assistant")?.content ||
-                "";
+            // Read the Server-Sent Events as they arrive and grow the bot reply token by token
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = "";
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
 
-            console.log("Bot response:", botMessage);
+                // Events are separated by a blank line; keep any incomplete one for the next chunk
+                const rawEvents = buffer.split("\n\n");
+                buffer = rawEvents.pop() ?? "";
+                for (const rawEvent of rawEvents) {
+                    if (!rawEvent.startsWith("data: ")) continue;
+                    const event = JSON.parse(rawEvent.slice("data: ".length));
 
-            setMessages([...messages, { user: userInput, bot: botMessage }]);
+                    if (event.type === "session") {
+                        rememberSessionId(event.session_id);
+                    } else if (event.type === "token") {
+                        botMessage += event.content;
+                    } else if (event.type === "tool_start") {
+                        setToolStatus(`Running ${event.name}...`);
+                    } else if (event.type === "tool_end") {
+                        setToolStatus(`${event.name} ${event.status ?? (event.ok ? "finished" : "failed")}`);
+                    } else if (event.type === "done") {
+                        botMessage = event.content ?? botMessage;
+                    } else if (event.type === "error") {
+                        console.error("Chatbot error:", event.error);
+                    }
+                    setMessages([...history, { user: prompt, bot: botMessage }]);
+                }
+            }
         } catch (error) {
             console.error("Error sending message:", error);
         }
 
-        setUserInput("");
+        setToolStatus(null);
         setLoading(false); // Stop loading animation
     };
 
@@ -135,6 +177,7 @@ const ChatBotPage: React.FC = () => {
                 {loading && (
                     <div style={{ textAlign: "center", marginTop: "10px" }}>
                         <div className="loader"></div>
+                        {toolStatus && <div style={{ fontSize: "0.85rem", marginTop: "6px" }}>{toolStatus}</div>}
                     </div>
                 )}
             </div>
@@ -172,6 +215,7 @@ const ChatBotPage: React.FC = () => {
                                 headers: {
                                     "Content-Type": "application/json",
                                 },
+                                body: JSON.stringify({ session_id: sessionId }),
                             });
                             setMessages([]); // Clear the chat messages
                         } catch (error) {